@@ -4,440 +4,63 @@
 
 from __future__ import annotations
 
+import base64
+import functools
+import gzip
+import http.client
 import json
 import os
 import re
+import threading
 import time
-from collections import defaultdict
+import zlib
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-import urllib.parse
-import urllib.request
-import urllib.error
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import SplitResult, quote, unquote, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
 
-API_BASE = "https://api.discogs.com"
-
-
-# ---- table store page layout (offline_gallery-style) ----
-HTML = """<!doctype html>
-<html lang="en">
-<head>
-  <meta charset="utf-8" />
-  <meta name="viewport" content="width=device-width,initial-scale=1" />
-  <title>Record Store</title>
-  <style>
-    html, body { margin: 0; padding: 0; }
-    body { font-family: Arial, sans-serif; background: #fff; color: #111; }
-    .wrap { padding: 12px 14px 72px; }
-    table { border-collapse: collapse; width: 100%; }
-    th, td { border-bottom: 1px solid #eee; padding: 8px 10px; text-align: left; vertical-align: middle; }
-    th { position: sticky; top: 0; background: #fafafa; z-index: 10; user-select: none; }
-    .nowrap { white-space: nowrap; }
-    img.thumb { width: 56px; height: 56px; object-fit: cover; border-radius: 6px; background: #f5f5f5; }
-    a.dlink { color: inherit; text-decoration: none; }
-    a.dlink:hover { text-decoration: underline; }
-
-    /* + / - controls */
-    .iconstack { display: flex; gap: 6px; align-items: center; }
-    .iconbtn { display:inline-flex; align-items:center; justify-content:center; width:34px; height:34px; padding:0;
-               border:1px solid #d6d6d6; background:#fff; border-radius:10px; cursor:pointer; }
-    .iconbtn:disabled { opacity: .45; cursor: not-allowed; }
-    .qty { min-width: 20px; text-align: center; font-weight: 700; }
-
-    /* hover image overlay (offline_gallery style) */
-    #imgHoverOverlay{position:fixed;display:none;z-index:9999;pointer-events:none}
-    #imgHoverOverlay img{max-width:520px;max-height:520px;min-width:240px;min-height:240px;box-shadow:0 10px 30px rgba(0,0,0,0.35);background:#000;border-radius:10px}
-    #imgHoverOverlay img{width:auto;height:auto}
-
-    /* cart button + modal */
-    .cartbtn { position: fixed; right: 14px; bottom: 14px; z-index: 100; border: 1px solid #d6d6d6; background: #fff;
-               border-radius: 12px; padding: 10px 12px; cursor: pointer; box-shadow: 0 6px 18px rgba(0,0,0,.08); }
-    .cartbtn .small { font-size: 12px; color: #666; display: block; margin-top: 2px; }
-
-    .modal { position: fixed; inset: 0; background: rgba(0,0,0,.35); display: none; align-items: center; justify-content: center; padding: 18px; z-index: 200; }
-    .modalbox { width: min(920px, 98vw); background: #fff; border-radius: 14px; border: 1px solid #e6e6e6; overflow: hidden; }
-    .modalhead { padding: 12px 14px; border-bottom: 1px solid #eee; display:flex; align-items:center; justify-content: space-between; gap: 10px;}
-    .modalbody { padding: 12px 14px; }
-    .modalfoot { padding: 12px 14px; border-top: 1px solid #eee; display:flex; gap:8px; flex-wrap: wrap; justify-content: flex-end; }
-    .btn { border: 1px solid #d6d6d6; background: #fff; padding: 8px 10px; border-radius: 10px; cursor: pointer; }
-    textarea { width: 100%; min-height: 240px; border: 1px solid #d6d6d6; border-radius: 10px; padding: 10px;
-               font-family: ui-monospace, SFMono-Regular, Menlo, Consolas, monospace; font-size: 12px; }
-    .status { padding: 12px 14px; color: #666; font-size: 12px; }
-  </style>
-</head>
-<body>
-  <div class="wrap">
-    <div id="status" class="status">Loading…</div>
-    <table id="tbl" aria-label="Store inventory" style="display:none">
-      <thead>
-        <tr>
-          <th class="nowrap">price</th>
-          <th class="nowrap">+ / −</th>
-          <th class="nowrap">cover</th>
-          <th>artist</th>
-          <th>title</th>
-          <th class="nowrap">year</th>
-          <th class="nowrap">format</th>
-        </tr>
-      </thead>
-      <tbody id="tbody"></tbody>
-    </table>
-  </div>
-
-  <button id="cartOpen" class="cartbtn" type="button">
-    Cart: <span id="cartCount">0</span> items
-    <span class="small">Total: $<span id="cartTotal">0</span></span>
-  </button>
-
-  <div id="cartModal" class="modal" aria-hidden="true">
-    <div class="modalbox">
-      <div class="modalhead">
-        <div style="font-weight:800">Cart</div>
-        <button id="cartClose" class="btn" type="button">Close</button>
-      </div>
-      <div class="modalbody">
-        <textarea id="cartText" spellcheck="false"></textarea>
-      </div>
-      <div class="modalfoot">
-        <button id="clearCartBtn" class="btn" type="button">Clear</button>
-        <button id="copyBtn" class="btn" type="button">Copy</button>
-      </div>
-    </div>
-  </div>
-
-  <script>
-  (function(){
-    const $ = (id)=>document.getElementById(id);
-
-    const state = { items: [], cart: {} };
-
-    function loadCart(){
-      try { state.cart = JSON.parse(localStorage.getItem("store_cart_v1")||"{}") || {}; }
-      catch(e){ state.cart = {}; }
-    }
-    function saveCart(){
-      try { localStorage.setItem("store_cart_v1", JSON.stringify(state.cart||{})); } catch(e){}
-    }
-    function cartQty(rid){ return Number(state.cart[String(rid)]||0) || 0; }
-
-    function money(n){
-      const x = Number(n||0);
-      if(!Number.isFinite(x)) return "0";
-      return String(Math.round(x));
-    }
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-    function rebuildCartText(){
-      const lines = [];
-      let total = 0;
-      let count = 0;
-
-      for(const ridStr of Object.keys(state.cart||{})){
-        const qty = Number(state.cart[ridStr]||0) || 0;
-        if(qty <= 0) continue;
-
-        const it = state.items.find(x => String(x.rid) === String(ridStr));
-        if(!it) continue;
-
-        count += qty;
-        const p = Number(it.price||0) || 0;
-        total += p * qty;
-
-        const year = it.year ? String(it.year) : "";
-        const url = "https://www.discogs.com/release/" + encodeURIComponent(String(it.rid));
-        lines.push(`${qty} x ${it.artist} - ${it.title}${year ? " ("+year+")" : ""}  $${money(p)}  ${url}`);
-      }
-
-      lines.sort((a,b)=>a.localeCompare(b, undefined, {numeric:true, sensitivity:"base"}));
-      lines.push("");
-      lines.push(`TOTAL: $${money(total)}   ITEMS: ${count}`);
-
-      $("cartText").value = lines.join("\n");
-      $("cartTotal").textContent = money(total);
-      $("cartCount").textContent = String(count);
-    }
-
-    function updateRowQty(rid){
-      const el = document.querySelector(`[data-qty-for="${CSS.escape(String(rid))}"]`);
-      if(el) el.textContent = String(cartQty(rid));
-    }
-
-    function addToCart(rid, delta){
-      const k = String(rid);
-      const cur = cartQty(k);
-      const next = cur + delta;
-      if(next <= 0) delete state.cart[k];
-      else state.cart[k] = next;
-      saveCart();
-      updateRowQty(k);
-      rebuildCartText();
-    }
-
-    function openCart(){
-      $("cartModal").style.display = "flex";
-      $("cartModal").setAttribute("aria-hidden","false");
-      rebuildCartText();
-    }
-    function closeCart(){
-      $("cartModal").style.display = "none";
-      $("cartModal").setAttribute("aria-hidden","true");
-    }
+API_BASE = "https://api.discogs.com"
+# per-release marketplace endpoints, formatted with the release id
+SUGG_URL = (API_BASE + "/marketplace/price_suggestions/{}").format
+STATS_URL = (API_BASE + "/marketplace/stats/{}").format
 
-    // --- Click-to-sort tables by clicking header cells (offline_gallery style) ---
-    function makeTableSortable(table){
-      if(!table) return;
-      const thead = table.querySelector("thead");
-      const tbody = table.querySelector("tbody");
-      if(!thead || !tbody) return;
-
-      const ths = Array.from(thead.querySelectorAll("th"));
-      const stateSort = { idx: -1, dir: 1 };
-
-      function cellText(tr, idx){
-        const td = tr.children[idx];
-        if(!td) return "";
-        const ds = td.getAttribute("data-sort");
-        return (ds || td.textContent || "").trim();
-      }
-
-      function cmp(a, b, idx){
-        const ha = (ths[idx]?.textContent || "").toLowerCase();
-        const av = cellText(a, idx);
-        const bv = cellText(b, idx);
-
-        if(ha.includes("price")){
-          const an = Number(av);
-          const bn = Number(bv);
-          const aok = Number.isFinite(an);
-          const bok = Number.isFinite(bn);
-          if(aok && bok) return an - bn;
-          if(aok && !bok) return -1;
-          if(!aok && bok) return 1;
-        }
-        if(ha.includes("year")){
-          const an = Number(av);
-          const bn = Number(bv);
-          const aok = Number.isFinite(an);
-          const bok = Number.isFinite(bn);
-          if(aok && bok) return an - bn;
-          if(aok && !bok) return -1;
-          if(!aok && bok) return 1;
-        }
-        return av.localeCompare(bv, undefined, { numeric:true, sensitivity:"base" });
-      }
-
-      function sortBy(idx){
-        const rows = Array.from(tbody.querySelectorAll("tr"));
-        const dir = (stateSort.idx === idx) ? -stateSort.dir : 1;
-        stateSort.idx = idx; stateSort.dir = dir;
-        rows.sort((ra, rb) => dir * cmp(ra, rb, idx));
-        rows.forEach(r => tbody.appendChild(r));
-      }
-
-      ths.forEach((th, idx) => {
-        th.style.cursor = "pointer";
-        th.title = "Click to sort";
-        th.addEventListener("click", () => sortBy(idx));
-      });
-    }
 
-    // --- Image hover preview (anchored, no modal) ---
-    function installHover(){
-      const hoverOverlay = document.createElement("div");
-      hoverOverlay.id = "imgHoverOverlay";
-      hoverOverlay.innerHTML = "<img/>";
-      document.body.appendChild(hoverOverlay);
-      const hoverImg = hoverOverlay.querySelector("img");
-      let currentImg = null;
-
-      function positionNearThumb(img){
-        const pad = 10;
-        const r = img.getBoundingClientRect();
-        const vw = window.innerWidth;
-        const vh = window.innerHeight;
-
-        const rect = hoverOverlay.getBoundingClientRect();
-        const w = rect.width || 0;
-        const h = rect.height || 0;
-
-        let x = r.right + pad;
-        let y = r.top;
-
-        if(x + w > vw) x = Math.max(pad, r.left - w - pad);
-        if(y + h > vh) y = Math.max(pad, vh - h - pad);
-        if(y < pad) y = pad;
-
-        hoverOverlay.style.left = x + "px";
-        hoverOverlay.style.top = y + "px";
-      }
-
-      function showPreview(img){
-        const full = img.getAttribute("data-full") || img.getAttribute("src") || "";
-        if(!full) return;
-        currentImg = img;
-        if(hoverImg.getAttribute("src") !== full) hoverImg.setAttribute("src", full);
-        hoverOverlay.style.display = "block";
-        positionNearThumb(img);
-      }
-
-      function hidePreview(){
-        hoverOverlay.style.display = "none";
-        hoverImg.setAttribute("src","");
-        currentImg = null;
-      }
-
-      hoverImg.addEventListener("load", ()=>{ if(currentImg) positionNearThumb(currentImg); });
-
-      document.addEventListener("mouseover", (e)=>{
-        const img = e.target.closest && e.target.closest("img.thumb");
-        if(!img) return;
-        showPreview(img);
-      });
-
-      document.addEventListener("mouseout", (e)=>{
-        const img = e.target.closest && e.target.closest("img.thumb");
-        if(!img) return;
-        hidePreview();
-      });
-
-      window.addEventListener("scroll", ()=>{ if(currentImg) positionNearThumb(currentImg); }, true);
-      window.addEventListener("resize", ()=>{ if(currentImg) positionNearThumb(currentImg); });
-    }
+def _json_loads(data: Any) -> Any:
+    """Parse JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
-    function render(){
-      const tbody = $("tbody");
-      tbody.innerHTML = "";
-      for(const it of state.items){
-        const rid = String(it.rid || "");
-        const priceNum = Number(it.price||0) || 0;
-        const year = it.year ? String(it.year) : "";
-        const img = it.img || "";
-        const url = "https://www.discogs.com/release/" + encodeURIComponent(rid);
-
-        const tr = document.createElement("tr");
-
-        const tdPrice = document.createElement("td");
-        tdPrice.className = "nowrap";
-        tdPrice.setAttribute("data-sort", String(priceNum));
-        tdPrice.textContent = "$" + money(priceNum);
-
-        const tdCart = document.createElement("td");
-        tdCart.className = "nowrap";
-        const wrap = document.createElement("div");
-        wrap.className = "iconstack";
-        const bMinus = document.createElement("button");
-        bMinus.className = "iconbtn";
-        bMinus.type = "button";
-        bMinus.textContent = "−";
-        bMinus.addEventListener("click", ()=>addToCart(rid, -1));
-        const qty = document.createElement("span");
-        qty.className = "qty";
-        qty.setAttribute("data-qty-for", rid);
-        qty.textContent = String(cartQty(rid));
-        const bPlus = document.createElement("button");
-        bPlus.className = "iconbtn";
-        bPlus.type = "button";
-        bPlus.textContent = "+";
-        bPlus.addEventListener("click", ()=>addToCart(rid, 1));
-        wrap.appendChild(bMinus); wrap.appendChild(qty); wrap.appendChild(bPlus);
-        tdCart.appendChild(wrap);
-
-        const tdCover = document.createElement("td");
-        tdCover.className = "nowrap";
-        const im = document.createElement("img");
-        im.className = "thumb";
-        if(img) im.src = img;
-        if(img) im.setAttribute("data-full", img);
-        im.alt = (it.artist||"") + " - " + (it.title||"");
-        tdCover.appendChild(im);
-
-        const tdArtist = document.createElement("td");
-        tdArtist.setAttribute("data-sort", (it.artist||"").trim());
-        tdArtist.textContent = (it.artist||"");
-
-        const tdTitle = document.createElement("td");
-        tdTitle.setAttribute("data-sort", (it.title||"").trim());
-        const a = document.createElement("a");
-        a.className = "dlink";
-        a.href = url;
-        a.target = "_blank";
-        a.rel = "noopener";
-        a.textContent = (it.title||"");
-        tdTitle.appendChild(a);
-
-        const tdYear = document.createElement("td");
-        tdYear.className = "nowrap";
-        tdYear.setAttribute("data-sort", year || "");
-        tdYear.textContent = year;
-
-        const tdFmt = document.createElement("td");
-        tdFmt.className = "nowrap";
-        tdFmt.setAttribute("data-sort", (it.format||"").trim());
-        tdFmt.textContent = (it.format||"");
-
-        tr.appendChild(tdPrice);
-        tr.appendChild(tdCart);
-        tr.appendChild(tdCover);
-        tr.appendChild(tdArtist);
-        tr.appendChild(tdTitle);
-        tr.appendChild(tdYear);
-        tr.appendChild(tdFmt);
-
-        tbody.appendChild(tr);
-      }
-
-      $("status").style.display = "none";
-      $("tbl").style.display = "";
-      makeTableSortable($("tbl"));
-      installHover();
-      rebuildCartText();
-    }
+def _json_dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
-    function boot(){
-      loadCart();
+def _json_dumps_indent(obj: Any) -> bytes:
+    """UTF-8 JSON bytes indented by 2 spaces."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
 
-      $("cartOpen").addEventListener("click", openCart);
-      $("cartClose").addEventListener("click", closeCart);
-      $("cartModal").addEventListener("click", (e)=>{ if(e.target === $("cartModal")) closeCart(); });
-      document.addEventListener("keydown", (e)=>{ if(e.key === "Escape") closeCart(); });
 
-      $("copyBtn").addEventListener("click", async ()=>{
-        try{
-          await navigator.clipboard.writeText($("cartText").value);
-          $("copyBtn").textContent = "Copied!";
-        }catch(e){
-          $("copyBtn").textContent = "Copy failed";
-        }
-        setTimeout(()=>$("copyBtn").textContent="Copy", 1200);
-      });
-
-      $("clearCartBtn").addEventListener("click", ()=>{
-        state.cart = {};
-        saveCart();
-        render();
-      });
-
-      fetch("store_inventory.json", {cache:"no-store"})
-        .then(r=>{
-          if(!r.ok) throw new Error("HTTP "+r.status);
-          return r.json();
-        })
-        .then(j=>{
-          state.items = (j && j.items) ? j.items : [];
-          $("status").textContent = "";
-          render();
-        })
-        .catch(err=>{
-          $("status").textContent = "Failed to load store_inventory.json: " + err;
-          console.error(err);
-        });
-    }
+# ---- table store page layout (offline_gallery-style) ----
+# The page lives in store.html next to this script; it is only read when the
+# HTML is actually written, kept as UTF-8 bytes and split once around the
+# title tag, so a build joins three pieces instead of scanning the template.
+_HTML_TITLE_TAG = b"<title>Record Store</title>"
 
-    boot();
-  })();
-  </script>
-</body>
-</html>
-"""
+@functools.lru_cache(maxsize=1)
+def _html_parts() -> Tuple[bytes, bytes]:
+    head, _, tail = (Path(__file__).parent / "store.html").read_bytes().partition(_HTML_TITLE_TAG)
+    return head, tail
 
 # ---- env helpers (existing var names) ----
 
@@ -455,83 +78,349 @@ def _norm(s: Any) -> str:
         return ""
     return str(s).strip()
 
+_WS_RE = re.compile(r"\s+")
+
 def _norm_key(s: str) -> str:
     s = _norm(s).lower()
-    s = re.sub(r"\s+", " ", s)
+    # Only single ASCII spaces (the common case) leave nothing for the regex to
+    # collapse; tabs, newlines and other Unicode spaces are all non-printable.
+    if "  " in s or not s.isprintable():
+        s = _WS_RE.sub(" ", s)
     return s
 
+def _as_rid(v: Any) -> Optional[int]:
+    """Release id as int, or None. Discogs sends ints (fast path); anything else gets the old int() tolerance."""
+    if type(v) is int:
+        return v
+    try:
+        return int(v)
+    except Exception:
+        return None
+
 def _make_key(artist: str, title: str) -> str:
     # Stable grouping key
     return f"{_norm_key(artist)}|{_norm_key(title)}"
 
 # ---- .env loader for local runs (store.bat also loads; this is fallback) ----
+# KEY=VALUE per line; leading/trailing blanks trimmed, lines starting with "#" skipped.
+_ENV_LINE_RE = re.compile(r"^[ \t]*([^\s#=][^=\r\n]*?)[ \t]*=[ \t]*(.*?)[ \t\r]*$", re.M)
+
+
 def load_env_file(path: Path) -> None:
     if not path.exists():
         return
     try:
-        for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            k, v = line.split("=", 1)
-            k = k.strip()
-            v = v.strip()
-            if k and k not in os.environ:
+        text = path.read_bytes().decode("utf-8", errors="replace")
+        for m in _ENV_LINE_RE.finditer(text):
+            k, v = m.group(1), m.group(2)
+            if k not in os.environ:
                 os.environ[k] = v
     except Exception:
         return
 
 # ---- Discogs HTTP ----
 
-def http_get_json(url: str, token: str, user_agent: str, sleep_s: float = 0.85) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
-    req = urllib.request.Request(
-        url,
-        headers={
-            "User-Agent": user_agent,
-            "Authorization": f"Discogs token={token}",
-            "Accept": "application/json",
-        },
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=120) as resp:
-            status = getattr(resp, "status", 200)
-            body = resp.read().decode("utf-8", errors="replace")
-        time.sleep(sleep_s)
-        return json.loads(body), status, None
-    except urllib.error.HTTPError as e:
+class RateLimiter:
+    """Sliding-window request limiter shared by all worker threads."""
+
+    def __init__(self, max_calls: int, period_s: float = 60.0) -> None:
+        self.max_calls = max(1, int(max_calls))
+        self.period_s = period_s
+        self._lock = threading.Lock()
+        self._stamps: deque = deque()
+        self._hold_until = 0.0
+
+    def hold(self, delay_s: float) -> None:
+        """Make every caller of wait() pause for at least delay_s from now."""
+        with self._lock:
+            self._hold_until = max(self._hold_until, time.monotonic() + delay_s)
+
+    def wait(self) -> None:
+        """Block until another request fits in the window, then claim the slot."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._hold_until:
+                    delay = self._hold_until - now
+                else:
+                    while self._stamps and now - self._stamps[0] >= self.period_s:
+                        self._stamps.popleft()
+                    if len(self._stamps) < self.max_calls:
+                        self._stamps.append(now)
+                        return
+                    delay = self.period_s - (now - self._stamps[0])
+            time.sleep(delay)
+
+# Discogs allows 60 authenticated requests/minute; stay a little under it.
+# main() applies STORE_RATE_PER_MIN.
+RATE_LIMITER = RateLimiter(55)
+
+# Discogs reports what is left of its moving one-minute window on every API
+# response; below this many requests every worker pauses until slots free up.
+RATELIMIT_LOW = 3
+
+def _note_rate_headers(resp: Any) -> None:
+    """Hold RATE_LIMITER on Retry-After, or when X-Discogs-Ratelimit-Remaining runs low."""
+    retry_after = resp.getheader("Retry-After")
+    if retry_after:
+        try:
+            RATE_LIMITER.hold(float(retry_after))
+            return
+        except ValueError:
+            pass
+    remaining = resp.getheader("X-Discogs-Ratelimit-Remaining")
+    if remaining and remaining.isdigit() and int(remaining) < RATELIMIT_LOW:
+        # one slot of the moving window frees up every period/max_calls seconds
+        RATE_LIMITER.hold(RATE_LIMITER.period_s / RATE_LIMITER.max_calls * (RATELIMIT_LOW - int(remaining)))
+
+def _validators(headers: Any) -> Dict[str, str]:
+    """ETag/Last-Modified from a response's headers (only the ones present)."""
+    out: Dict[str, str] = {}
+    for name in ("ETag", "Last-Modified"):
+        v = headers.get(name) if headers is not None else None
+        if v:
+            out[name] = v
+    return out
+
+# One keep-alive connection per (scheme, host) per worker thread, so the pricing
+# pool pays the TCP+TLS handshake once per worker instead of once per call.
+_CONN_LOCAL = threading.local()
+
+@functools.lru_cache(maxsize=16)
+def _proxy_for(scheme: str, netloc: str) -> Optional[SplitResult]:
+    """The HTTP(S)_PROXY proxy for this host (honouring NO_PROXY, as urlopen does), or None."""
+    proxy = getproxies().get(scheme)
+    if not proxy or proxy_bypass(netloc.rsplit(":", 1)[0]):
+        return None
+    return urlsplit(proxy if "://" in proxy else "http://" + proxy)
+
+def _proxy_auth(proxy: SplitResult) -> Dict[str, str]:
+    """Proxy-Authorization header for user:pass@ in the proxy URL (empty if none)."""
+    if proxy.username is None:
+        return {}
+    cred = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(cred.encode("utf-8")).decode("ascii")}
+
+def _connection(scheme: str, netloc: str) -> http.client.HTTPConnection:
+    conns = getattr(_CONN_LOCAL, "conns", None)
+    if conns is None:
+        conns = _CONN_LOCAL.conns = {}
+    conn = conns.get((scheme, netloc))
+    if conn is None:
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = _proxy_for(scheme, netloc)
+        if proxy is None:
+            conn = cls(netloc, timeout=120)
+        else:
+            conn = cls(proxy.hostname, proxy.port, timeout=120)
+            if scheme == "https":
+                # CONNECT tunnel; TLS still runs end to end with the real host
+                conn.set_tunnel(netloc, headers=_proxy_auth(proxy))
+        conns[(scheme, netloc)] = conn
+    return conn
+
+def _drop_connection(scheme: str, netloc: str) -> None:
+    conn = getattr(_CONN_LOCAL, "conns", {}).pop((scheme, netloc), None)
+    if conn is not None:
+        conn.close()
+
+def _keepalive_get(url: str, headers: Dict[str, str]) -> Tuple[http.client.HTTPResponse, bytes]:
+    """GET url on this thread's kept-alive connection to its host. Returns (response, raw body); raises on transport errors."""
+    parts = urlsplit(url)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    if parts.scheme == "http":
+        proxy = _proxy_for(parts.scheme, parts.netloc)
+        if proxy is not None:
+            # plain HTTP through a proxy: absolute-URI request line
+            path = url
+            headers = {**headers, **_proxy_auth(proxy)}
+    # A kept-alive connection may have been closed by the server while idle;
+    # retry once on a fresh one (GET is idempotent).
+    for attempt in (0, 1):
         try:
-            body = e.read().decode("utf-8", errors="replace")
+            conn = _connection(parts.scheme, parts.netloc)
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+        except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError):
+            _drop_connection(parts.scheme, parts.netloc)
+            if attempt:
+                raise
+            continue
         except Exception:
-            body = ""
-        time.sleep(sleep_s)
-        return None, int(getattr(e, "code", 0) or 0), (body[:500] if body else str(e))
+            _drop_connection(parts.scheme, parts.netloc)
+            raise
+        if resp.will_close:
+            _drop_connection(parts.scheme, parts.netloc)
+        return resp, body
+    raise http.client.RemoteDisconnected("connection closed")  # not reached
+
+# Redirects are followed by hand (http.client doesn't), up to MAX_REDIRECTS hops.
+_REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+MAX_REDIRECTS = 5
+
+# Transient statuses are retried with exponential backoff (0.5 s, 1 s, 2 s); every
+# attempt still goes through RATE_LIMITER.
+_RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+HTTP_RETRIES = 3
+HTTP_BACKOFF_S = 0.5
+
+def _http_get(url: str, token: str, user_agent: str, extra_headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str], Dict[str, str]]:
+    """GET url as JSON. Returns (json, status, err, validators) where validators holds any ETag/Last-Modified."""
+    for attempt in range(HTTP_RETRIES + 1):
+        j, status, err, validators = _http_get_once(url, token, user_agent, extra_headers)
+        if status not in _RETRY_STATUSES or attempt == HTTP_RETRIES:
+            break
+        if status == 429:
+            # rate limited: back off every worker, not just this one
+            RATE_LIMITER.hold(HTTP_BACKOFF_S * (2 ** attempt))
+        else:
+            time.sleep(HTTP_BACKOFF_S * (2 ** attempt))
+    return j, status, err, validators
+
+@functools.lru_cache(maxsize=4)
+def _base_headers(token: str, user_agent: str) -> Dict[str, str]:
+    """Request headers shared by every call with these credentials (built once; never mutated)."""
+    return {
+        "User-Agent": user_agent,
+        "Authorization": f"Discogs token={token}",
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip",
+    }
+
+def _http_get_once(url: str, token: str, user_agent: str, extra_headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str], Dict[str, str]]:
+    headers = _base_headers(token, user_agent)
+    if extra_headers:
+        headers = {**headers, **extra_headers}
+    RATE_LIMITER.wait()
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            resp, body = _keepalive_get(url, headers)
+            location = resp.getheader("Location")
+            if resp.status not in _REDIRECT_STATUSES or not location:
+                break
+            target = urljoin(url, location)
+            if urlsplit(target).netloc != urlsplit(url).netloc:
+                # never hand the Discogs token to another host
+                headers = {k: v for k, v in headers.items() if k != "Authorization"}
+            url = target
+        if (resp.getheader("Content-Encoding") or "").lower() == "gzip":
+            body = gzip.decompress(body)
+    except Exception as e:
+        return None, None, str(e), {}
+    status = resp.status
+    _note_rate_headers(resp)
+    if status == 304:
+        return None, 304, None, _validators(resp.headers)
+    if status >= 300:
+        text = body.decode("utf-8", errors="replace")
+        return None, status, (text[:500] if text else f"HTTP Error {status}: {resp.reason}"), {}
+    try:
+        return _json_loads(body), status, None, _validators(resp.headers)
     except Exception as e:
-        time.sleep(sleep_s)
-        return None, None, str(e)
+        return None, None, str(e), {}
+
+def http_get_json(url: str, token: str, user_agent: str) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
+    j, status, err, _ = _http_get(url, token, user_agent)
+    return j, status, err
 
 
-def cached_http_get_json(url: str, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int, sleep_s: float = 0.0) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
-    """Cache wrapper around http_get_json. Cache key is the full URL."""
+# In-flight fetches by URL: concurrent callers for the same URL share the
+# first caller's Future instead of issuing a second request.
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def _single_flight(key: str, fn: Callable[[], Any]) -> Any:
+    """Run fn() once per key at a time; callers arriving meanwhile wait for its result."""
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        leader = fut is None
+        if leader:
+            fut = _INFLIGHT[key] = Future()
+    if not leader:
+        return fut.result()
+    try:
+        res = fn()
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            del _INFLIGHT[key]
+    fut.set_result(res)
+    return res
+
+def cached_http_get_json(url: str, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
+    """Cache wrapper around http_get_json. Cache key is the full URL; concurrent calls for one URL share a fetch."""
+    return _single_flight(url, lambda: _cached_http_get_json(url, token, user_agent, cache, ttl_days))
+
+# Entries that keep coming back unchanged live up to this many base TTLs.
+TTL_MAX_SCALE = 8
+
+def ttl_scale(streak: int) -> int:
+    """TTL multiplier for an entry refreshed unchanged `streak` times in a row: 1, 2, 4, ... capped at TTL_MAX_SCALE."""
+    return min(TTL_MAX_SCALE, 1 << min(int(streak or 0), 8))
+
+def _cached_http_get_json(url: str, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
+    """Cache wrapper around http_get_json. Cache key is the full URL.
+
+    Each entry carries a streak of consecutive unchanged refreshes (200 with an
+    identical body, or 304); its TTL is ttl_days * ttl_scale(streak).
+    """
     ent = cache.get(url) if isinstance(cache, dict) else None
+    cond: Dict[str, str] = {}
     if isinstance(ent, dict):
         ts = ent.get("ts")
         if ts is not None and ttl_days is not None:
             try:
-                if (time.time() - float(ts)) <= float(ttl_days) * 86400.0:
+                if (time.time() - float(ts)) <= float(ttl_days) * 86400.0 * ttl_scale(ent.get("streak")):
                     return ent.get("json"), ent.get("status"), ent.get("err")
             except Exception:
                 pass
+        # Expired body with a validator -> revalidate instead of re-downloading it.
+        if ent.get("json") is not None:
+            if ent.get("etag"):
+                cond["If-None-Match"] = ent["etag"]
+            if ent.get("last_modified"):
+                cond["If-Modified-Since"] = ent["last_modified"]
     # Miss or expired entry -> fetch from network and populate cache
-    j, status, err = http_get_json(url, token, user_agent, sleep_s=sleep_s)
+    j, status, err, validators = _http_get(url, token, user_agent, cond)
+    if status == 304 and isinstance(ent, dict):
+        # Not modified: keep the cached body, restart its TTL and extend its streak.
+        cache[url] = dict(ent, ts=time.time(), streak=int(ent.get("streak") or 0) + 1)
+        return ent.get("json"), ent.get("status"), ent.get("err")
     if isinstance(cache, dict):
-        cache[url] = {"ts": time.time(), "status": status, "err": err, "json": j}
+        # A successful refresh identical to the stored body extends the streak; anything else resets it.
+        unchanged = status == 200 and isinstance(ent, dict) and ent.get("json") == j
+        streak = int(ent.get("streak") or 0) + 1 if unchanged else 0
+        new_ent = {"ts": time.time(), "status": status, "err": err, "json": j, "streak": streak}
+        if validators.get("ETag"):
+            new_ent["etag"] = validators["ETag"]
+        if validators.get("Last-Modified"):
+            new_ent["last_modified"] = validators["Last-Modified"]
+        cache[url] = new_ent
     return j, status, err
 
 
-def paged_releases(url: str, token: str, user_agent: str, per_page: int = 100) -> Tuple[List[Dict[str, Any]], Dict[str,int]]:
+# basic_information keys the builders read; everything else in a collection
+# row (resource URLs, genres, styles, master ids, ...) is dropped on arrival.
+_BI_FIELDS = ("id", "title", "artists", "labels", "formats", "year", "country", "cover_image", "thumb")
+
+def _slim_row(bi: Dict[str, Any]) -> Dict[str, Any]:
+    """Collection row reduced to {"basic_information": <only _BI_FIELDS>}."""
+    return {"basic_information": {k: bi[k] for k in _BI_FIELDS if k in bi}}
+
+def paged_releases(url: str, token: str, user_agent: str, per_page: int = 100, seen_rids: Optional[set] = None) -> Tuple[List[Dict[str, Any]], Dict[str,int]]:
+    """Fetch every page of a collection folder.
+
+    Rows are cut down to the basic_information fields the builder reads as
+    each page arrives, and when seen_rids is given, rows whose release id is
+    already in it are dropped on the spot, so only one page of raw JSON is
+    held at a time. stats counts raw "rows" and dropped "dups".
+    """
     out: List[Dict[str, Any]] = []
     page = 1
-    stats = {"pages":0, "http_errors":0}
+    stats = {"pages":0, "http_errors":0, "rows":0, "dups":0}
     while True:
         join = "&" if "?" in url else "?"
         u = f"{url}{join}per_page={per_page}&page={page}"
@@ -542,7 +431,18 @@ def paged_releases(url: str, token: str, user_agent: str, per_page: int = 100) -
         items = data.get("releases") or []
         if not items:
             break
-        out.extend(items)
+        for rr in items:
+            stats["rows"] += 1
+            bi = rr.get("basic_information") or {}
+            if seen_rids is not None:
+                rid_i = _as_rid(bi.get("id"))
+                if rid_i is None:
+                    continue
+                if rid_i in seen_rids:
+                    stats["dups"] += 1
+                    continue
+                seen_rids.add(rid_i)
+            out.append(_slim_row(bi))
         stats["pages"] += 1
         pagination = data.get("pagination") or {}
         pages = pagination.get("pages")
@@ -551,6 +451,9 @@ def paged_releases(url: str, token: str, user_agent: str, per_page: int = 100) -
         if pages is None and len(items) < per_page:
             break
         page += 1
+        # drop the parsed page before requesting the next one, so two raw pages
+        # are never alive at once
+        data = items = None
     return out, stats
 
 def parse_discogs_folders(s: str) -> List[Tuple[str, int]]:
@@ -569,43 +472,167 @@ def parse_discogs_folders(s: str) -> List[Tuple[str, int]]:
     return out
 
 def pick_folder(folders: List[Tuple[str,int]]) -> Tuple[str,int]:
+    # one pass builds both lookups; the first folder wins on duplicates
+    by_id: Dict[int, str] = {}
+    by_name: Dict[str, Tuple[str, int]] = {}
+    for n,i in folders:
+        by_id.setdefault(i, n)
+        by_name.setdefault(n.lower(), (n, i))
+
     forced_id = env("STORE_FOLDER_ID")
     if forced_id:
         try:
             fid = int(forced_id)
-            for n,i in folders:
-                if i == fid:
-                    return n,i
-            return str(fid), fid
+            return by_id.get(fid, str(fid)), fid
         except Exception:
             pass
 
     preferred = env("STORE_FOLDER_NAME")
-    if preferred:
-        for n,i in folders:
-            if n.lower() == preferred.lower():
-                return n,i
-
-    for n,i in folders:
-        if n.lower() == "for sale":
-            return n,i
+    if preferred and preferred.lower() in by_name:
+        return by_name[preferred.lower()]
 
-    return folders[0]
+    return by_name.get("for sale") or folders[0]
 
 # ---- Marketplace median ----
 
-def load_cache(path: Path) -> Dict[str, Any]:
+# Level 1: the log is written line by line, so speed matters more than ratio.
+CACHE_GZIP_LEVEL = 1
+
+class JsonCache(dict):
+    """Response cache dict backed by an append-only, gzip-compressed JSONL log.
+
+    Every store appends one {"k": key, "v": entry} line, so a run writes only
+    what it fetched and a crash keeps everything stored so far (each line is
+    sync-flushed through the compressor). load_cache() replays the log (later
+    lines win); save_cache() compacts it once it holds more than twice as many
+    lines as live entries.
+
+    Keys whose entry carries an error are tracked as they are stored, so the
+    end-of-run diagnostics read a few samples instead of scanning the cache.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.log_lines = 0
+        self._log: Any = None
+        self._lock = threading.Lock()
+        self._err_keys: Dict[str, None] = {}  # insertion-ordered set
+
+    def _track_err(self, key: str, value: Any) -> None:
+        if isinstance(value, dict) and value.get("err"):
+            self._err_keys[key] = None
+        else:
+            self._err_keys.pop(key, None)
+
+    def track_loaded_errors(self) -> None:
+        """Seed the error index from entries loaded without __setitem__."""
+        for k, v in self.items():
+            self._track_err(k, v)
+
+    def error_samples(self, limit: int = 5) -> List[Tuple[str, Optional[int], str]]:
+        """Up to limit (key, status, err) triples for cached entries holding an error."""
+        out: List[Tuple[str, Optional[int], str]] = []
+        with self._lock:
+            for k in self._err_keys:
+                if len(out) >= limit:
+                    break
+                v = self[k]
+                out.append((k, v.get("status"), v["err"]))
+        return out
+
+    def open_log(self, path: Path) -> None:
+        self._log = gzip.open(path, "ab", compresslevel=CACHE_GZIP_LEVEL)
+
+    def close_log(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        super().__setitem__(key, value)
+        line = _json_dumps({"k": key, "v": value}) + b"\n" if self._log is not None else None
+        with self._lock:
+            self._track_err(key, value)
+            if line is not None:
+                self._log.write(line)
+                self._log.flush()
+                self.log_lines += 1
+
+def _retire_imported(path: Path) -> None:
+    """Move an imported legacy cache aside to <name>.imported (replacing any earlier one).
+
+    Not fatal if that fails: the next run just imports it again, which is harmless.
+    """
+    try:
+        os.replace(path, path.with_name(path.name + ".imported"))
+    except OSError:
+        pass
+
+def _compact_cache(path: Path, cache: JsonCache) -> None:
+    """Rewrite the log as one line per live entry."""
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wb", compresslevel=CACHE_GZIP_LEVEL) as f:
+        for k, v in cache.items():
+            f.write(_json_dumps({"k": k, "v": v}) + b"\n")
+    os.replace(tmp, path)
+    cache.log_lines = len(cache)
+
+def _replay_log(f: Any, cache: JsonCache) -> bool:
+    """Load log lines into cache; False if the stream ended in a torn gzip member."""
+    try:
+        for line in f:
+            try:
+                rec = _json_loads(line)
+                dict.__setitem__(cache, rec["k"], rec["v"])
+            except Exception:
+                continue  # e.g. a torn last line after a crash
+            cache.log_lines += 1
+    except (EOFError, OSError, zlib.error):
+        return False
+    return True
+
+def load_cache(path: Path) -> JsonCache:
+    cache = JsonCache()
+    # A torn member (crash mid-append) would hide everything appended after
+    # it, so rewrite the log from what decoded before appending again.
+    rewrite = False
     if path.exists():
+        with gzip.open(path, "rb") as f:
+            rewrite = not _replay_log(f, cache)
+    # One-time imports of the older uncompressed caches: the plain
+    # cache.jsonl log, then the whole-file cache.json snapshot.
+    plain = path.with_suffix("")
+    if plain.suffix == ".jsonl" and plain.exists():
+        with plain.open("rb") as f:
+            old_log = JsonCache()
+            _replay_log(f, old_log)
+        for k, v in old_log.items():
+            dict.setdefault(cache, k, v)
+        _retire_imported(plain)
+        rewrite = True
+    legacy = plain.with_suffix(".json")
+    if legacy.exists():
         try:
-            return json.loads(path.read_text(encoding="utf-8"))
+            old = _json_loads(legacy.read_bytes())
         except Exception:
-            return {}
-    return {}
-
-def save_cache(path: Path, cache: Dict[str, Any]) -> None:
-    path.write_text(json.dumps(cache, indent=2, sort_keys=True), encoding="utf-8")
-
-def get_median(release_id: int, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int, sleep_s: float = 0.95) -> Tuple[Optional[float], Optional[int], Optional[str]]:
+            old = {}
+        for k, v in (old.items() if isinstance(old, dict) else []):
+            dict.setdefault(cache, k, v)
+        _retire_imported(legacy)
+        rewrite = True
+    if rewrite:
+        _compact_cache(path, cache)
+    cache.track_loaded_errors()
+    cache.open_log(path)
+    return cache
+
+def save_cache(path: Path, cache: JsonCache) -> None:
+    # Entries were appended as they were stored; only compaction is left.
+    cache.close_log()
+    if cache.log_lines > 2 * len(cache):
+        _compact_cache(path, cache)
+
+def get_median(release_id: int, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int) -> Tuple[Optional[float], Optional[int], Optional[str]]:
     key = str(release_id)
     now = int(time.time())
     cached = cache.get(key)
@@ -618,8 +645,8 @@ def get_median(release_id: int, token: str, user_agent: str, cache: Dict[str, An
             med = cached.get("median") if ("median" in cached) else cached.get("median_usd")
             return med, cached.get("status"), cached.get("err")
 
-    url = f"{API_BASE}/marketplace/stats/{release_id}"
-    data, status, err = cached_http_get_json(url, token, user_agent, cache, ttl_days, sleep_s=sleep_s)
+    url = STATS_URL(release_id)
+    data, status, err = cached_http_get_json(url, token, user_agent, cache, ttl_days)
     median_f: Optional[float] = None
     if data and isinstance(data, dict):
         m = data.get("median")
@@ -633,9 +660,90 @@ def get_median(release_id: int, token: str, user_agent: str, cache: Dict[str, An
     cache[key] = {"ts": now, "median": median_f, "median_usd": median_f, "status": status, "err": err}
     return median_f, status, err
 
+_SUGGESTION_PRIORITY = ("Very Good (VG)", "Very Good Plus (VG+)", "Near Mint (NM or M-)", "Mint (M)")
+
+def _rows_by_condition(rows: List[Any]) -> Dict[Any, Any]:
+    by_cond: Dict[Any, Any] = {}
+    for row in rows:
+        if type(row) is dict:
+            # Only string conditions can match a lookup (and a list/dict one isn't hashable)
+            c = row.get("condition")
+            if type(c) is str:
+                by_cond.setdefault(c, row)
+    return by_cond
+
+# payload shape -> {condition: entry}; for lists the first row per condition wins.
+# Parsed JSON only ever yields plain dict/list, so dispatch is one exact-type lookup.
+_BY_CONDITION = {dict: lambda ps: ps, list: _rows_by_condition}
+
+def _price_value(ent: Any) -> Optional[float]:
+    """Float from a suggestion entry ({"value": ...} or a bare number); None if missing or unparseable."""
+    v = ent.get("value") if type(ent) is dict else ent
+    if v is None or v == "":
+        return None
+    try:
+        return float(v)
+    except Exception:
+        return None
+
+def _parse_suggestion(sugg_json: Any) -> Optional[float]:
+    """Pick the suggested price from a price_suggestions payload (default VG, then better grades)."""
+    if type(sugg_json) is not dict:
+        return None
+    ps = sugg_json.get("price_suggestions")
+    if ps is None:
+        ps = sugg_json
+    to_by_cond = _BY_CONDITION.get(type(ps))
+    if to_by_cond is None:
+        return None
+    by_cond = to_by_cond(ps)
+    values = (_price_value(by_cond.get(cond)) for cond in _SUGGESTION_PRIORITY)
+    return next((v for v in values if v is not None), None)
+
+def price_release(rid_i: int, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int) -> Tuple[Optional[float], Optional[float], Optional[int]]:
+    """Fetch pricing for one release. Returns (suggested, median, median_status); median is only looked up when no suggestion exists."""
+    # Prefer Discogs price suggestions by condition (default VG)
+    sugg_url = SUGG_URL(rid_i)
+    sugg_json, sugg_status, sugg_err = cached_http_get_json(sugg_url, token, user_agent, cache, ttl_days)
+    suggested = _parse_suggestion(sugg_json)
+    if suggested is not None:
+        return suggested, None, None
+    median, status, err = get_median(rid_i, token, user_agent, cache, ttl_days)
+    return None, median, status
+
+def _apply_floor(suggested: Optional[float], median: Optional[float], status: Optional[int], floor: float, stats: Dict[str, int]) -> float:
+    """Pick the price for one group and count the outcome in stats."""
+    if suggested is not None:
+        value = float(suggested)
+    else:
+        if status == 401:
+            stats["http_401"] += 1
+        elif status == 403:
+            stats["http_403"] += 1
+        elif status == 404:
+            stats["http_404"] += 1
+        elif status == 429:
+            stats["http_429"] += 1
+        elif isinstance(status, int) and status >= 400:
+            stats["http_other"] += 1
+
+        if median is None:
+            if status is None or (isinstance(status, int) and status >= 400):
+                stats["median_errors"] += 1
+            else:
+                stats["median_missing"] += 1
+            return floor
+        value = float(median)
+    # One conversion, one floor comparison for both sources.
+    if value < floor:
+        stats["median_missing"] += 1
+        return floor
+    stats["median_ok"] += 1
+    return value
+
 # ---- Build items in legacy schema ----
 
-def build_items_from_discogs(releases: List[Dict[str, Any]], floor: float, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int) -> Tuple[List[dict], Dict[str,int]]:
+def build_items_from_discogs(releases: List[Dict[str, Any]], floor: float, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int, workers: int = 8) -> Tuple[List[dict], Dict[str,int]]:
     groups: Dict[str, dict] = {}
     by_key_rids: Dict[str, List[int]] = defaultdict(list)
 
@@ -655,134 +763,89 @@ def build_items_from_discogs(releases: List[Dict[str, Any]], floor: float, token
     for r in releases:
         stats["rows"] += 1
         bi = r.get("basic_information") or {}
-        rid = bi.get("id")
-        if rid is None:
-            continue
-        try:
-            rid_i = int(rid)
-        except Exception:
+        rid_i = _as_rid(bi.get("id"))
+        if rid_i is None:
             continue
 
         title = _norm(bi.get("title"))
-        artists = bi.get("artists") or []
-        artist = ""
-        if isinstance(artists, list) and artists:
-            artist = _norm(artists[0].get("name"))
+        artists = bi.get("artists")
+        artist = _norm(artists[0].get("name")) if isinstance(artists, list) and artists else ""
+
+        # later pressings of a known (artist, title) only add their rid, so
+        # everything below the key is computed once per group
+        key = _make_key(artist, title)
+        by_key_rids[key].append(rid_i)
+        if key in groups:
+            continue
+
         year = bi.get("year")
         try:
             year_i = int(year) if year not in (None, "") else None
         except Exception:
             year_i = None
         country = _norm(bi.get("country"))
-        labels = bi.get("labels") or []
-        label = _norm(labels[0].get("name")) if isinstance(labels, list) and labels else ""
-        catno = _norm(labels[0].get("catno")) if isinstance(labels, list) and labels else ""
-        formats = bi.get("formats") or []
+        labels = bi.get("labels")
+        first_label = labels[0] if isinstance(labels, list) and labels else None
+        label = _norm(first_label.get("name")) if first_label else ""
+        catno = _norm(first_label.get("catno")) if first_label else ""
+        formats = bi.get("formats")
         fmt = _norm(formats[0].get("name")) if isinstance(formats, list) and formats else ""
         img = _norm(bi.get("thumb") or bi.get("cover_image") or "")
 
-        key = _make_key(artist, title)
-        by_key_rids[key].append(rid_i)
-
-        if key not in groups:
-            groups[key] = {
-                "key": key,
-                "artist": artist,
-                "title": title,
-                "year": year_i,
-                "country": country,
-                "label": label,
-                "catno": catno,
-                "format": fmt,
-                "rid": str(rid_i),
-                "img": img,
-                "price": "",          # string per legacy
-                "status": "available",
-                "condition": "",
-                "sleeve_condition": "",
-                "notes": "",
-            }
-
-    # price each group using the first rid for that group
-    for idx, (key, g) in enumerate(groups.items(), start=1):
-        rid_i = int(g.get("rid") or 0)
-        if idx == 1 or idx % 100 == 0:
-            print(f"Pricing {idx}/{len(groups)} ...", flush=True)
-        # Prefer Discogs price suggestions by condition (default VG)
-        suggested = None
-        sugg_url = f"{API_BASE}/marketplace/price_suggestions/{rid_i}"
-        sugg_json, sugg_status, sugg_err = cached_http_get_json(sugg_url, token, user_agent, cache, ttl_days, sleep_s=0.95)
-        if isinstance(sugg_json, dict):
-            ps = sugg_json.get("price_suggestions")
-            if ps is None:
-                ps = sugg_json
-            priority = ("Very Good (VG)", "Very Good Plus (VG+)", "Near Mint (NM or M-)", "Mint (M)")
-            if isinstance(ps, dict):
-                for cond in priority:
-                    ent = ps.get(cond)
-                    if isinstance(ent, dict):
-                        v = ent.get("value")
-                    else:
-                        v = ent
-                    try:
-                        suggested = float(v) if v not in (None, "") else None
-                    except Exception:
-                        suggested = None
-                    if suggested is not None:
-                        break
-            elif isinstance(ps, list):
-                for cond in priority:
-                    for row in ps:
-                        if isinstance(row, dict) and row.get("condition") == cond:
-                            v = row.get("value")
-                            try:
-                                suggested = float(v) if v not in (None, "") else None
-                            except Exception:
-                                suggested = None
-                            break
-                    if suggested is not None:
-                        break
-        
-        if suggested is not None:
-            if float(suggested) < floor:
-                stats["median_missing"] += 1
-                price = floor
-            else:
-                stats["median_ok"] += 1
-                price = float(suggested)
-        else:
-            median, status, err = get_median(rid_i, token, user_agent, cache, ttl_days)
-            if status == 401:
-                stats["http_401"] += 1
-            elif status == 403:
-                stats["http_403"] += 1
-            elif status == 404:
-                stats["http_404"] += 1
-            elif status == 429:
-                stats["http_429"] += 1
-            elif isinstance(status, int) and status >= 400:
-                stats["http_other"] += 1
-        
-            if median is None:
-                if status is None or (isinstance(status, int) and status >= 400):
-                    stats["median_errors"] += 1
-                else:
-                    stats["median_missing"] += 1
-                price = floor
-            else:
-                if float(median) < floor:
-                    stats["median_missing"] += 1
-                    price = floor
-                else:
-                    stats["median_ok"] += 1
-                    price = float(median)
-        g["price"] = str(int(round(price)))
+        groups[key] = {
+            "key": key,
+            "artist": artist,
+            "title": title,
+            "year": year_i,
+            "country": country,
+            "label": label,
+            "catno": catno,
+            "format": fmt,
+            "rid": str(rid_i),
+            "img": img,
+            "price": "",          # string per legacy
+            "status": "available",
+            "condition": "",
+            "sleeve_condition": "",
+            "notes": "",
+        }
 
+    # price each group using the first rid for that group; fetches run on a
+    # bounded pool (RATE_LIMITER paces them), results are consumed in order.
+    work = [(g, int(g.get("rid") or 0)) for g in groups.values()]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        priced = ex.map(lambda w: price_release(w[1], token, user_agent, cache, ttl_days), work)
+        for idx, ((g, rid_i), (suggested, median, status)) in enumerate(zip(work, priced), start=1):
+            if idx == 1 or idx % 100 == 0:
+                print(f"Pricing {idx}/{len(groups)} ...", flush=True)
+            price = _apply_floor(suggested, median, status, floor, stats)
+            g["price"] = str(int(round(price)))
+
+    # casefold the (artist, title) sort key once per item, then sort indices on it
     items = list(groups.values())
-    items.sort(key=lambda x: ((x.get("artist") or "").lower(), (x.get("title") or "").lower()))
+    keys = [((it.get("artist") or "").casefold(), (it.get("title") or "").casefold()) for it in items]
+    items = [items[i] for i in sorted(range(len(items)), key=keys.__getitem__)]
     stats["groups"] = len(items)
     return items, stats
 
+def write_inventory(path: Path, items: List[dict], pretty: bool = False) -> None:
+    """Stream {"items": [...]} to disk one item per line (never holds the whole document as one string).
+
+    pretty writes the indented form in one go instead (manual inspection only).
+    """
+    # Written beside the target and swapped in, so a crash never leaves a truncated inventory
+    tmp = path.with_name(path.name + ".tmp")
+    if pretty:
+        tmp.write_bytes(_json_dumps_indent({"items": items}))
+    else:
+        with tmp.open("wb") as f:
+            f.write(b'{"items": [')
+            for i, it in enumerate(items):
+                f.write(b",\n" if i else b"\n")
+                f.write(_json_dumps(it))
+            f.write(b"\n]}\n")
+    os.replace(tmp, path)
+
 # ---- Main ----
 
 def main() -> int:
@@ -799,6 +862,8 @@ def main() -> int:
     title = env("STORE_TITLE", "Record Store") or "Record Store"
     floor = float(env("STORE_MIN_PRICE", "5") or "5")
     ttl_days = int(env("STORE_CACHE_TTL_DAYS", "14") or "14")
+    workers = int(env("STORE_HTTP_WORKERS", "8") or "8")
+    RATE_LIMITER.max_calls = max(1, int(env("STORE_RATE_PER_MIN", "55") or "55"))
 
     if not token:
         print("ERROR: DISCOGS_TOKEN missing.", flush=True)
@@ -817,102 +882,76 @@ def main() -> int:
 
     OUT_ROOT = records_out / "store"
     SITE_DIR = OUT_ROOT / "site"
-    CACHE_PATH = OUT_ROOT / "cache.json"
+    CACHE_PATH = OUT_ROOT / "cache.jsonl.gz"
     ensure_dir(SITE_DIR)
 
-    print("=== Store Builder (Legacy Layout + Discogs prices) ===", flush=True)
-    print(f"DISCOGS user: {username}", flush=True)
-    print(f"Folders: {len(folders)}", flush=True)
-    for fn, fid in folders:
-        print(f"  - {fn} ({fid})", flush=True)
-    print(f"Floor: ${int(floor)}", flush=True)
-    print(f"Output site: {SITE_DIR}", flush=True)
-    print(f"Cache: {CACHE_PATH}", flush=True)
-
-    # Fetch releases across *all* folders listed in DISCOGS_FOLDERS, then de-dupe by release_id.
-    releases_all: List[Dict[str, Any]] = []
-    combined_stats = {"pages": 0, "http_errors": 0}
-    for fn, fid in folders:
-        releases_url = f"{API_BASE}/users/{urllib.parse.quote(username)}/collection/folders/{fid}/releases"
-        rels, rel_stats = paged_releases(releases_url, token, user_agent, per_page=100)
-        releases_all.extend(rels)
-        combined_stats["pages"] += int(rel_stats.get("pages", 0) or 0)
-        combined_stats["http_errors"] += int(rel_stats.get("http_errors", 0) or 0)
-        print(f"Folder fetched: {fn} ({fid}) | pages: {rel_stats.get('pages',0)} | rows: {len(rels)} | http_errors: {rel_stats.get('http_errors',0)}", flush=True)
-
-    # De-dupe by Discogs release_id (basic_information.id)
+    banner = ["=== Store Builder (Legacy Layout + Discogs prices) ===", f"DISCOGS user: {username}", f"Folders: {len(folders)}"]
+    banner.extend(f"  - {fn} ({fid})" for fn, fid in folders)
+    banner += [f"Floor: ${int(floor)}", f"Output site: {SITE_DIR}", f"Cache: {CACHE_PATH}"]
+    print("\n".join(banner), flush=True)
+
+    # Fetch releases across *all* folders listed in DISCOGS_FOLDERS, de-duped by
+    # Discogs release_id (basic_information.id) page by page as they arrive;
+    # the first row per id wins.
     seen_rids: set[int] = set()
     releases: List[Dict[str, Any]] = []
-    dup_rows = 0
-    for rr in releases_all:
-        bi = rr.get("basic_information") or {}
-        rid = bi.get("id")
-        if rid is None:
-            continue
-        try:
-            rid_i = int(rid)
-        except Exception:
-            continue
-        if rid_i in seen_rids:
-            dup_rows += 1
-            continue
-        seen_rids.add(rid_i)
-        releases.append(rr)
+    combined_stats = {"pages": 0, "http_errors": 0, "rows": 0, "dups": 0}
+    for fn, fid in folders:
+        releases_url = f"{API_BASE}/users/{quote(username)}/collection/folders/{fid}/releases"
+        rels, rel_stats = paged_releases(releases_url, token, user_agent, per_page=100, seen_rids=seen_rids)
+        releases.extend(rels)
+        for k in combined_stats:
+            combined_stats[k] += int(rel_stats.get(k, 0) or 0)
+        print(f"Folder fetched: {fn} ({fid}) | pages: {rel_stats.get('pages',0)} | rows: {rel_stats.get('rows',0)} | http_errors: {rel_stats.get('http_errors',0)}", flush=True)
 
     print(
-        f"Collection API pages (sum): {combined_stats.get('pages',0)} | rows (raw): {len(releases_all)} | rows (dedup by release_id): {len(releases)} | dup_rows_dropped: {dup_rows} | http_errors (sum): {combined_stats.get('http_errors',0)}",
+        f"Collection API pages (sum): {combined_stats.get('pages',0)} | rows (raw): {combined_stats.get('rows',0)} | rows (dedup by release_id): {len(releases)} | dup_rows_dropped: {combined_stats.get('dups',0)} | http_errors (sum): {combined_stats.get('http_errors',0)}",
         flush=True,
     )
-    # Quick live probe: attempt marketplace stats for first release_id to capture raw failure mode
+    # Optional live probe (STORE_PROBE=1): attempt marketplace stats for the first
+    # release_id to capture the raw failure mode. Off by default: it is an uncached
+    # call in front of all real work on every run.
     probe_rid = None
-    for rr in releases:
-        bi = rr.get("basic_information") or {}
-        rid = bi.get("id")
-        if rid is not None:
-            try:
-                probe_rid = int(rid)
-                break
-            except Exception:
-                pass
+    if (env("STORE_PROBE", "0") or "0") == "1":
+        rids = (_as_rid((rr.get("basic_information") or {}).get("id")) for rr in releases)
+        probe_rid = next((rid for rid in rids if rid is not None), None)
     if probe_rid:
-        probe_url = f"{API_BASE}/marketplace/stats/{probe_rid}"
-        d, st, er = http_get_json(probe_url, token, user_agent, sleep_s=0.0)
+        probe_url = STATS_URL(probe_rid)
+        d, st, er = http_get_json(probe_url, token, user_agent)
         print(f"Marketplace probe rid={probe_rid} status={st} err={er}", flush=True)
 
     cache = load_cache(CACHE_PATH)
-    items, price_stats = build_items_from_discogs(releases, floor, token, user_agent, cache, ttl_days)
+    items, price_stats = build_items_from_discogs(releases, floor, token, user_agent, cache, ttl_days, workers)
     save_cache(CACHE_PATH, cache)
 
     inv_path = SITE_DIR / "store_inventory.json"
-    inv_path.write_text(json.dumps({"items": items}, ensure_ascii=False, indent=2), encoding="utf-8")
+    # The page's fetch() doesn't need indentation; STORE_PRETTY=1 keeps it for hand inspection.
+    write_inventory(inv_path, items, pretty=(env("STORE_PRETTY", "0") or "0") == "1")
     print(f"Wrote: {inv_path}", flush=True)
 
     html_path = SITE_DIR / "index.html"
-    html_out = HTML.replace("<title>Record Store</title>", f"<title>{title}</title>")
-    html_path.write_text(html_out, encoding="utf-8")
+    head, tail = _html_parts()
+    html_out = b"".join((head, f"<title>{title}</title>".encode("utf-8"), tail))
+    html_path.write_bytes(html_out)
+    # a precompressed copy left by store_webpage.py (STORE_GZIP=1) would now be stale
+    html_path.with_name(html_path.name + ".gz").unlink(missing_ok=True)
     print(f"Site: {html_path}", flush=True)
 
-    # Pricing diagnostics
-    print("--- Pricing diagnostics ---", flush=True)
+    # Pricing diagnostics, collected and written in one go
+    diag = ["--- Pricing diagnostics ---"]
     # Always show up to 5 sample errors from marketplace stats calls
     if price_stats.get("median_errors", 0) > 0:
-        samples = []
-        for rid, v in cache.items():
-            if isinstance(v, dict):
-                err = v.get("err")
-                status = v.get("status")
-                if err:
-                    samples.append((rid, status, err))
+        samples = cache.error_samples(5)
         if samples:
-            print("sample_marketplace_errors:", flush=True)
-            for rid, status, err in samples[:5]:
-                print(f"  rid={rid} status={status} err={err}", flush=True)
+            diag.append("sample_marketplace_errors:")
+            diag.extend(f"  rid={rid} status={status} err={err}" for rid, status, err in samples[:5])
         else:
-            print("sample_marketplace_errors: (none recorded in cache)", flush=True)
+            diag.append("sample_marketplace_errors: (none recorded in cache)")
     for k in ["groups","median_ok","median_missing","median_errors","http_401","http_403","http_404","http_429","http_other"]:
-        print(f"{k}: {price_stats.get(k,0)}", flush=True)
+        diag.append(f"{k}: {price_stats.get(k,0)}")
     if price_stats.get("http_429",0) > 0:
-        print("NOTE: HTTP 429 indicates rate limiting; rerun later or increase cache TTL.", flush=True)
+        diag.append("NOTE: HTTP 429 indicates rate limiting; rerun later or increase cache TTL.")
+    print("\n".join(diag), flush=True)
 
     print("Done.", flush=True)
     return 0
@@ -10,15 +10,44 @@ import re
 import time
 import hashlib
 import csv
-from collections import defaultdict
+import base64
+import functools
+import gzip
+import http.client
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from sys import intern
 from typing import Optional
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import urllib.parse
 import urllib.request
-import urllib.error
 
-API_BASE = 
+try:
+    import orjson  # optional: faster JSON for API bodies and the response cache
+except ImportError:
+    orjson = None
+
+API_BASE = "https://api.discogs.com"
+# per-release marketplace endpoints, formatted with the release id
+SUGG_URL = (API_BASE + "/marketplace/price_suggestions/{}").format
+STATS_URL = (API_BASE + "/marketplace/stats/{}").format
+
+# ---- JSON helpers (orjson when installed, stdlib otherwise) ----
+
+def _json_loads(data: Any) -> Any:
+    """Parse JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 # ---- local asset helpers ----
 
@@ -26,28 +55,68 @@ def _md5_16(s: str) -> str:
     h = hashlib.md5(s.encode("utf-8", errors="ignore")).hexdigest()
     return h[:16]
 
+@functools.lru_cache(maxsize=4096)
+def _cover_filename(url: str) -> str:
+    """Local file name for a cover URL: md5_16(url) plus the URL's image extension (.jpeg if unknown)."""
+    try:
+        ext = Path(urllib.parse.urlparse(url).path).suffix.lower()
+        if ext not in [".jpg", ".jpeg", ".png", ".webp"]:
+            ext = ".jpeg"
+    except Exception:
+        ext = ".jpeg"
+    return _md5_16(url) + ext
+
 def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
-def download_image(url: str, out_path: Path, timeout: int = 30) -> bool:
-    """Download url -> out_path if missing. Returns True if file exists after call."""
-    try:
-        if out_path.exists() and out_path.stat().st_size > 0:
-            return True
-    except Exception:
-        pass
+_IMG_HEADERS = {"User-Agent": "records-store/1.0"}
+
+def download_image(url: str, out_path: Path, timeout: float = 30) -> bool:
+    """Download url -> out_path (out_path.parent must already exist). Returns True if a non-empty file was written.
+
+    Callers skip covers already on disk via local_images().
+    """
     if not url:
         return False
+    part = out_path.with_name(out_path.name + ".part")
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "records-store/1.0"})
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            data = resp.read()
-        ensure_dir(out_path.parent)
-        out_path.write_bytes(data)
-        return out_path.exists() and out_path.stat().st_size > 0
+        # Covers come from a single image host, so each worker reuses one
+        # kept-alive connection; redirects are followed by hand.
+        for _ in range(MAX_REDIRECTS + 1):
+            resp, data = _keepalive_get(url, _IMG_HEADERS, timeout)
+            location = resp.getheader("Location")
+            if resp.status not in _REDIRECT_STATUSES or not location:
+                break
+            url = urllib.parse.urljoin(url, location)
+        if resp.status != 200 or not data:
+            return False
+        # Swap in a finished file: a partial one would look present to local_images()
+        part.write_bytes(data)
+        os.replace(part, out_path)
+        return True
     except Exception:
+        # no stray .part files left in site/images (it gets deployed)
+        try:
+            part.unlink(missing_ok=True)
+        except OSError:
+            pass
         return False
 
+def local_images(images_dir: Path) -> set[str]:
+    """Names of the non-empty files in images_dir, from one directory scan."""
+    names: set[str] = set()
+    try:
+        with os.scandir(images_dir) as entries:
+            for de in entries:
+                try:
+                    if de.is_file() and de.stat().st_size > 0:
+                        names.add(de.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return names
+
 def load_year_map(records_csv: Path) -> dict[int, str]:
     """Optional: offline_gallery records.csv -> {release_id:int: year:str}."""
     mp: dict[int, str] = {}
@@ -55,17 +124,22 @@ def load_year_map(records_csv: Path) -> dict[int, str]:
         return mp
     try:
         with records_csv.open("r", encoding="utf-8", errors="replace", newline="") as f:
-            reader = csv.DictReader(f)
-            # try common column names
+            reader = csv.DictReader(f, restval="")
+            # try common column names (resolved once from the header)
+            cols = reader.fieldnames or []
+            rid_cols = [c for c in ("release_id", "rid", "id") if c in cols]
+            year_cols = [c for c in ("year", "released") if c in cols]
+            if not rid_cols or not year_cols:
+                return mp
             for row in reader:
-                rid_s = (row.get("release_id") or row.get("rid") or row.get("id") or "").strip()
+                rid_s = next((row[c] for c in rid_cols if row[c]), "").strip()
                 if not rid_s:
                     continue
                 try:
                     rid = int(rid_s)
                 except Exception:
                     continue
-                year = (row.get("year") or row.get("released") or "").strip()
+                year = next((row[c] for c in year_cols if row[c]), "").strip()
                 if year:
                     mp[rid] = year
     except Exception:
@@ -75,26 +149,34 @@ def load_year_map(records_csv: Path) -> dict[int, str]:
 def format_display(basic_information: dict) -> str:
     """Build a richer format string (e.g. Vinyl, 7\", 45 RPM, Single)."""
     formats = basic_information.get("formats") or []
+    if not isinstance(formats, list):
+        return ""
+    # Many releases share one formats payload; key the memo on a hashable signature.
+    sig = tuple(
+        (f.get("name"), tuple(f["descriptions"]) if isinstance(f.get("descriptions"), list) else (), f.get("text"))
+        for f in formats if isinstance(f, dict)
+    )
+    try:
+        return _format_display_sig(sig)
+    except TypeError:  # unhashable values in the payload: format without the memo
+        return _format_display_sig.__wrapped__(sig)
+
+@functools.lru_cache(maxsize=512)
+def _format_display_sig(sig: Tuple[Tuple[Any, Any, Any], ...]) -> str:
     parts: list[str] = []
-    if isinstance(formats, list):
-        for f in formats:
-            if not isinstance(f, dict):
-                continue
-            name = _norm(f.get("name") or "")
-            desc = f.get("descriptions") or []
-            dparts = []
-            if isinstance(desc, list):
-                for d in desc:
-                    d = _norm(d)
-                    if d:
-                        dparts.append(d)
-            text = _norm(f.get("text") or "")
-            # keep compact
-            seg = ", ".join([p for p in [name] + dparts + ([text] if text else []) if p])
-            if seg:
-                parts.append(seg)
+    for name, desc, text in sig:
+        name = _norm(name or "")
+        dparts = []
+        for d in desc:
+            d = _norm(d)
+            if d:
+                dparts.append(d)
+        text = _norm(text or "")
+        # keep compact
+        seg = ", ".join([p for p in [name] + dparts + ([text] if text else []) if p])
+        if seg:
+            parts.append(seg)
     return " / ".join(parts) if parts else ""
-"https://api.discogs.com"
 
 
 # ---- env helpers (existing var names) ----
@@ -105,91 +187,327 @@ def env(name: str, default: Optional[str] = None) -> Optional[str]:
         return default
     return v
 
-def ensure_dir(p: Path) -> None:
-    p.mkdir(parents=True, exist_ok=True)
+_WS_RE = re.compile(r"\s+")
 
 def _norm(s: Any) -> str:
-    if s is None:
-        return ""
-    return str(s).strip()
+    return "" if s is None else str(s).strip()
 
 def _norm_key(s: str) -> str:
     s = _norm(s).lower()
-    s = re.sub(r"\s+", " ", s)
+    # Only single ASCII spaces (the common case) leave nothing for the regex to
+    # collapse; tabs, newlines and other Unicode spaces are all non-printable.
+    if "  " in s or not s.isprintable():
+        s = _WS_RE.sub(" ", s)
     return s
 
+def _as_rid(v: Any) -> Optional[int]:
+    """Release id as int, or None. Discogs sends ints (fast path); anything else gets the old int() tolerance."""
+    if type(v) is int:
+        return v
+    try:
+        return int(v)
+    except Exception:
+        return None
+
 def _make_key(artist: str, title: str) -> str:
     # Stable grouping key
     return f"{_norm_key(artist)}|{_norm_key(title)}"
 
 # ---- .env loader for local runs (store.bat also loads; this is fallback) ----
+# KEY=VALUE per line; leading/trailing blanks trimmed, lines starting with "#" skipped.
+_ENV_LINE_RE = re.compile(r"^[ \t]*([^\s#=][^=\r\n]*?)[ \t]*=[ \t]*(.*?)[ \t\r]*$", re.M)
+
+
 def load_env_file(path: Path) -> None:
     if not path.exists():
         return
     try:
-        for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            k, v = line.split("=", 1)
-            k = k.strip()
-            v = v.strip()
-            if k and k not in os.environ:
+        text = path.read_bytes().decode("utf-8", errors="replace")
+        for m in _ENV_LINE_RE.finditer(text):
+            k, v = m.group(1), m.group(2)
+            if k not in os.environ:
                 os.environ[k] = v
     except Exception:
         return
 
 # ---- Discogs HTTP ----
 
-def http_get_json(url: str, token: str, user_agent: str, sleep_s: float = 0.85) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
-    req = urllib.request.Request(
-        url,
-        headers={
-            "User-Agent": user_agent,
-            "Authorization": f"Discogs token={token}",
-            "Accept": "application/json",
-        },
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=120) as resp:
-            status = getattr(resp, "status", 200)
-            body = resp.read().decode("utf-8", errors="replace")
-        time.sleep(sleep_s)
-        return json.loads(body), status, None
-    except urllib.error.HTTPError as e:
+class RateLimiter:
+    """Sliding-window request limiter shared by all worker threads."""
+
+    def __init__(self, max_calls: int, period_s: float = 60.0) -> None:
+        self.max_calls = max(1, int(max_calls))
+        self.period_s = period_s
+        self._lock = threading.Lock()
+        self._stamps: deque = deque()
+        self._hold_until = 0.0
+
+    def hold(self, delay_s: float) -> None:
+        """Make every caller of wait() pause for at least delay_s from now."""
+        with self._lock:
+            self._hold_until = max(self._hold_until, time.monotonic() + delay_s)
+
+    def wait(self) -> None:
+        """Block until another request fits in the window, then claim the slot."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._hold_until:
+                    delay = self._hold_until - now
+                else:
+                    while self._stamps and now - self._stamps[0] >= self.period_s:
+                        self._stamps.popleft()
+                    if len(self._stamps) < self.max_calls:
+                        self._stamps.append(now)
+                        return
+                    delay = self.period_s - (now - self._stamps[0])
+            time.sleep(delay)
+
+# Discogs allows 60 authenticated requests/minute; stay a little under it.
+# main() applies STORE_RATE_PER_MIN.
+RATE_LIMITER = RateLimiter(55)
+
+# Discogs reports what is left of its moving one-minute window on every API
+# response; below this many requests every worker pauses until slots free up.
+RATELIMIT_LOW = 3
+
+def _note_rate_headers(resp: Any) -> None:
+    """Hold RATE_LIMITER on Retry-After, or when X-Discogs-Ratelimit-Remaining runs low."""
+    retry_after = resp.getheader("Retry-After")
+    if retry_after:
         try:
-            body = e.read().decode("utf-8", errors="replace")
+            RATE_LIMITER.hold(float(retry_after))
+            return
+        except ValueError:
+            pass
+    remaining = resp.getheader("X-Discogs-Ratelimit-Remaining")
+    if remaining and remaining.isdigit() and int(remaining) < RATELIMIT_LOW:
+        # one slot of the moving window frees up every period/max_calls seconds
+        RATE_LIMITER.hold(RATE_LIMITER.period_s / RATE_LIMITER.max_calls * (RATELIMIT_LOW - int(remaining)))
+
+# One keep-alive connection per (scheme, host) per worker thread, so calls to
+# api.discogs.com skip the TCP+TLS handshake after the first one.
+_CONN_LOCAL = threading.local()
+
+@functools.lru_cache(maxsize=16)
+def _proxy_for(scheme: str, netloc: str) -> Optional[urllib.parse.SplitResult]:
+    """The HTTP(S)_PROXY proxy for this host (honouring NO_PROXY, as urlopen does), or None."""
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(netloc.rsplit(":", 1)[0]):
+        return None
+    return urllib.parse.urlsplit(proxy if "://" in proxy else "http://" + proxy)
+
+def _proxy_auth(proxy: urllib.parse.SplitResult) -> Dict[str, str]:
+    """Proxy-Authorization header for user:pass@ in the proxy URL (empty if none)."""
+    if proxy.username is None:
+        return {}
+    cred = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(cred.encode("utf-8")).decode("ascii")}
+
+def _connection(scheme: str, netloc: str) -> http.client.HTTPConnection:
+    conns = getattr(_CONN_LOCAL, "conns", None)
+    if conns is None:
+        conns = _CONN_LOCAL.conns = {}
+    conn = conns.get((scheme, netloc))
+    if conn is None:
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = _proxy_for(scheme, netloc)
+        if proxy is None:
+            conn = cls(netloc, timeout=120)
+        else:
+            conn = cls(proxy.hostname, proxy.port, timeout=120)
+            if scheme == "https":
+                # CONNECT tunnel; TLS still runs end to end with the real host
+                conn.set_tunnel(netloc, headers=_proxy_auth(proxy))
+        conns[(scheme, netloc)] = conn
+    return conn
+
+def _drop_connection(scheme: str, netloc: str) -> None:
+    conn = getattr(_CONN_LOCAL, "conns", {}).pop((scheme, netloc), None)
+    if conn is not None:
+        conn.close()
+
+def _keepalive_get(url: str, headers: Dict[str, str], timeout: float = 120) -> Tuple[http.client.HTTPResponse, bytes]:
+    """GET url on this thread's kept-alive connection to its host. Returns (response, raw body); raises on transport errors.
+
+    timeout (seconds) applies to this request only; the connection is shared across calls.
+    """
+    parts = urllib.parse.urlsplit(url)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    if parts.scheme == "http":
+        proxy = _proxy_for(parts.scheme, parts.netloc)
+        if proxy is not None:
+            # plain HTTP through a proxy: absolute-URI request line
+            path = url
+            headers = {**headers, **_proxy_auth(proxy)}
+    # A kept-alive connection may have been closed by the server while idle;
+    # retry once on a fresh one (GET is idempotent).
+    for attempt in (0, 1):
+        try:
+            conn = _connection(parts.scheme, parts.netloc)
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+        except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError):
+            _drop_connection(parts.scheme, parts.netloc)
+            if attempt:
+                raise
+            continue
         except Exception:
-            body = ""
-        time.sleep(sleep_s)
-        return None, int(getattr(e, "code", 0) or 0), (body[:500] if body else str(e))
+            _drop_connection(parts.scheme, parts.netloc)
+            raise
+        if resp.will_close:
+            _drop_connection(parts.scheme, parts.netloc)
+        return resp, body
+    raise http.client.RemoteDisconnected("connection closed")  # not reached
+
+# Redirects are followed by hand (http.client doesn't), up to MAX_REDIRECTS hops.
+_REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+MAX_REDIRECTS = 5
+
+# Transient statuses are retried with exponential backoff (0.5 s, 1 s, 2 s); every
+# attempt still goes through RATE_LIMITER.
+_RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+HTTP_RETRIES = 3
+HTTP_BACKOFF_S = 0.5
+
+def _http_get(url: str, token: str, user_agent: str, extra_headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str], Dict[str, str]]:
+    """GET url as JSON. Returns (json, status, err, validators) where validators holds any ETag/Last-Modified."""
+    for attempt in range(HTTP_RETRIES + 1):
+        j, status, err, validators = _http_get_once(url, token, user_agent, extra_headers)
+        if status not in _RETRY_STATUSES or attempt == HTTP_RETRIES:
+            break
+        if status == 429:
+            # rate limited: back off every worker, not just this one
+            RATE_LIMITER.hold(HTTP_BACKOFF_S * (2 ** attempt))
+        else:
+            time.sleep(HTTP_BACKOFF_S * (2 ** attempt))
+    return j, status, err, validators
+
+@functools.lru_cache(maxsize=4)
+def _base_headers(token: str, user_agent: str) -> Dict[str, str]:
+    """Request headers shared by every call with these credentials (built once; never mutated)."""
+    return {
+        "User-Agent": user_agent,
+        "Authorization": f"Discogs token={token}",
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip",
+    }
+
+def _http_get_once(url: str, token: str, user_agent: str, extra_headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str], Dict[str, str]]:
+    headers = _base_headers(token, user_agent)
+    if extra_headers:
+        headers = {**headers, **extra_headers}
+    RATE_LIMITER.wait()
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            resp, body = _keepalive_get(url, headers)
+            location = resp.getheader("Location")
+            if resp.status not in _REDIRECT_STATUSES or not location:
+                break
+            target = urllib.parse.urljoin(url, location)
+            if urllib.parse.urlsplit(target).netloc != urllib.parse.urlsplit(url).netloc:
+                # never hand the Discogs token to another host
+                headers = {k: v for k, v in headers.items() if k != "Authorization"}
+            url = target
+        if (resp.getheader("Content-Encoding") or "").lower() == "gzip":
+            body = gzip.decompress(body)
+    except Exception as e:
+        return None, None, str(e), {}
+    status = resp.status
+    _note_rate_headers(resp)
+    validators: Dict[str, str] = {}
+    for name in ("ETag", "Last-Modified"):
+        v = resp.getheader(name)
+        if v:
+            validators[name] = v
+    if status == 304:
+        return None, status, None, validators
+    if status >= 300:
+        text = body.decode("utf-8", errors="replace")
+        return None, status, (text[:500] if text else f"HTTP Error {status}: {resp.reason}"), {}
+    try:
+        return _json_loads(body), status, None, validators
     except Exception as e:
-        time.sleep(sleep_s)
-        return None, None, str(e)
+        return None, None, str(e), {}
 
+def http_get_json(url: str, token: str, user_agent: str) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
+    j, status, err, _ = _http_get(url, token, user_agent)
+    return j, status, err
+
+
+# In-flight fetches by URL: concurrent callers for the same URL share the
+# first caller's Future instead of issuing a second request.
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def _single_flight(key: str, fn: Callable[[], Any]) -> Any:
+    """Run fn() once per key at a time; callers arriving meanwhile wait for its result."""
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        leader = fut is None
+        if leader:
+            fut = _INFLIGHT[key] = Future()
+    if not leader:
+        return fut.result()
+    try:
+        res = fn()
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            del _INFLIGHT[key]
+    fut.set_result(res)
+    return res
 
-def cached_http_get_json(url: str, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int, sleep_s: float = 0.0) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
+def cached_http_get_json(url: str, token: str, user_agent: str, cache: SqliteCache, ttl_days: int) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
+    """Cache wrapper around http_get_json. Cache key is the full URL; concurrent calls for one URL share a fetch."""
+    return _single_flight(url, lambda: _cached_http_get_json(url, token, user_agent, cache, ttl_days))
+
+def _cached_http_get_json(url: str, token: str, user_agent: str, cache: SqliteCache, ttl_days: int) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str]]:
     """Cache wrapper around http_get_json. Cache key is the full URL."""
-    ent = cache.get(url) if isinstance(cache, dict) else None
-    if isinstance(ent, dict):
-        ts = ent.get("ts")
-        if ts is not None and ttl_days is not None:
-            try:
-                if (time.time() - float(ts)) <= float(ttl_days) * 86400.0:
-                    return ent.get("json"), ent.get("status"), ent.get("err")
-            except Exception:
-                pass
-    # Miss or expired entry -> fetch from network and populate cache
-    j, status, err = http_get_json(url, token, user_agent, sleep_s=sleep_s)
-    if isinstance(cache, dict):
-        cache[url] = {"ts": time.time(), "status": status, "err": err, "json": j}
+    ent = cache.get(url)
+    if ent is not None and ent["ts"] >= time.time() - float(ttl_days) * 86400.0 * ttl_scale(ent["streak"]):
+        return ent["json"], ent["status"], ent["err"]
+    # Miss or expired entry -> fetch from network and populate cache. An expired
+    # body with a validator is revalidated; 304 keeps it and just restarts its TTL.
+    cond: Dict[str, str] = {}
+    if ent is not None and ent["json"] is not None:
+        if ent["etag"]:
+            cond["If-None-Match"] = ent["etag"]
+        if ent["last_modified"]:
+            cond["If-Modified-Since"] = ent["last_modified"]
+    j, status, err, validators = _http_get(url, token, user_agent, cond)
+    if status == 304 and ent is not None:
+        cache.touch(url, time.time())
+        return ent["json"], ent["status"], ent["err"]
+    cache.put(url, time.time(), status, err, j, validators.get("ETag"), validators.get("Last-Modified"))
     return j, status, err
 
 
-def paged_releases(url: str, token: str, user_agent: str, per_page: int = 100) -> Tuple[List[Dict[str, Any]], Dict[str,int]]:
+# basic_information keys the builders read; everything else in a collection
+# row (resource URLs, genres, styles, master ids, ...) is dropped on arrival.
+_BI_FIELDS = ("id", "title", "artists", "labels", "formats", "year", "country", "cover_image", "thumb")
+
+def _slim_row(bi: Dict[str, Any]) -> Dict[str, Any]:
+    """Collection row reduced to {"basic_information": <only _BI_FIELDS>}."""
+    return {"basic_information": {k: bi[k] for k in _BI_FIELDS if k in bi}}
+
+def paged_releases(url: str, token: str, user_agent: str, per_page: int = 100, seen_rids: Optional[set] = None) -> Tuple[List[Dict[str, Any]], Dict[str,int]]:
+    """Fetch every page of a collection folder.
+
+    Rows are cut down to the basic_information fields the builder reads as
+    each page arrives, and when seen_rids is given, rows whose release id is
+    already in it are dropped on the spot, so only one page of raw JSON is
+    held at a time. stats counts raw "rows" and dropped "dups".
+    """
     out: List[Dict[str, Any]] = []
     page = 1
-    stats = {"pages":0, "http_errors":0}
+    stats = {"pages":0, "http_errors":0, "rows":0, "dups":0}
     while True:
         join = "&" if "?" in url else "?"
         u = f"{url}{join}per_page={per_page}&page={page}"
@@ -200,7 +518,18 @@ def paged_releases(url: str, token: str, user_agent: str, per_page: int = 100) -
         items = data.get("releases") or []
         if not items:
             break
-        out.extend(items)
+        for rr in items:
+            stats["rows"] += 1
+            bi = rr.get("basic_information") or {}
+            if seen_rids is not None:
+                rid_i = _as_rid(bi.get("id"))
+                if rid_i is None:
+                    continue
+                if rid_i in seen_rids:
+                    stats["dups"] += 1
+                    continue
+                seen_rids.add(rid_i)
+            out.append(_slim_row(bi))
         stats["pages"] += 1
         pagination = data.get("pagination") or {}
         pages = pagination.get("pages")
@@ -209,6 +538,9 @@ def paged_releases(url: str, token: str, user_agent: str, per_page: int = 100) -
         if pages is None and len(items) < per_page:
             break
         page += 1
+        # drop the parsed page before requesting the next one, so two raw pages
+        # are never alive at once
+        data = items = None
     return out, stats
 
 def parse_discogs_folders(s: str) -> List[Tuple[str, int]]:
@@ -227,57 +559,155 @@ def parse_discogs_folders(s: str) -> List[Tuple[str, int]]:
     return out
 
 def pick_folder(folders: List[Tuple[str,int]]) -> Tuple[str,int]:
+    # one pass builds both lookups; the first folder wins on duplicates
+    by_id: Dict[int, str] = {}
+    by_name: Dict[str, Tuple[str, int]] = {}
+    for n,i in folders:
+        by_id.setdefault(i, n)
+        by_name.setdefault(n.lower(), (n, i))
+
     forced_id = env("STORE_FOLDER_ID")
     if forced_id:
         try:
             fid = int(forced_id)
-            for n,i in folders:
-                if i == fid:
-                    return n,i
-            return str(fid), fid
+            return by_id.get(fid, str(fid)), fid
         except Exception:
             pass
 
     preferred = env("STORE_FOLDER_NAME")
-    if preferred:
-        for n,i in folders:
-            if n.lower() == preferred.lower():
-                return n,i
+    if preferred and preferred.lower() in by_name:
+        return by_name[preferred.lower()]
 
-    for n,i in folders:
-        if n.lower() == "for sale":
-            return n,i
+    return by_name.get("for sale") or folders[0]
 
-    return folders[0]
+# ---- Response cache (SQLite) ----
 
-# ---- Marketplace median ----
+# Entries that keep coming back unchanged live up to this many base TTLs.
+TTL_MAX_SCALE = 8
+
+def ttl_scale(streak: int) -> int:
+    """TTL multiplier for an entry refreshed unchanged `streak` times in a row: 1, 2, 4, ... capped at TTL_MAX_SCALE."""
+    return min(TTL_MAX_SCALE, 1 << min(int(streak or 0), 8))
+
+def _retire_imported(path: Path) -> None:
+    """Move an imported legacy cache aside to <name>.imported (replacing any earlier one).
+
+    Not fatal if that fails: the next run just imports it again, which is harmless.
+    """
+    try:
+        os.replace(path, path.with_name(path.name + ".imported"))
+    except OSError:
+        pass
+
+class SqliteCache:
+    """Key -> (ts, status, err, json, etag, last_modified, streak) rows in one SQLite table (WAL mode).
+
+    Keys are full URLs for raw API responses and the bare release id for
+    computed medians. Each put() is its own small commit, so a crash or
+    Ctrl-C mid-run keeps everything fetched so far.
+
+    streak counts consecutive refreshes that came back unchanged; the
+    entry's TTL is scaled by ttl_scale(streak), so stable releases are
+    refetched less often while ones whose prices move keep the base TTL.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (url TEXT PRIMARY KEY, ts REAL, status INTEGER, err TEXT, json BLOB,"
+            " etag TEXT, last_modified TEXT, streak INTEGER NOT NULL DEFAULT 0)"
+        )
+        # older caches lack the validator / streak columns
+        cols = {r[1] for r in self.conn.execute("PRAGMA table_info(cache)")}
+        for col, decl in (("etag", "TEXT"), ("last_modified", "TEXT"), ("streak", "INTEGER NOT NULL DEFAULT 0")):
+            if col not in cols:
+                self.conn.execute(f"ALTER TABLE cache ADD COLUMN {col} {decl}")
+
+    def get(self, key: str, max_age_s: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Return {ts, status, err, json, etag, last_modified, streak} for key, or None if missing or
+        older than max_age_s scaled by the entry's stability streak."""
+        sql = "SELECT ts, status, err, json, etag, last_modified, streak FROM cache WHERE url = ?"
+        args: Tuple[Any, ...] = (key,)
+        if max_age_s is not None:
+            sql += f" AND ts >= ? - ? * min({TTL_MAX_SCALE}, 1 << min(streak, 8))"
+            args = (key, time.time(), max_age_s)
+        with self._lock:
+            row = self.conn.execute(sql, args).fetchone()
+        if row is None:
+            return None
+        ts, status, err, blob, etag, last_modified, streak = row
+        return {"ts": ts, "status": status, "err": err, "json": _json_loads(blob) if blob is not None else None,
+                "etag": etag, "last_modified": last_modified, "streak": streak}
+
+    def put(self, key: str, ts: float, status: Optional[int], err: Optional[str], obj: Any,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        blob = _json_dumps(obj) if obj is not None else None
+        # A successful refresh identical to the stored body extends the streak; anything else resets it.
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO cache (url, ts, status, err, json, etag, last_modified, streak) VALUES (?, ?, ?, ?, ?, ?, ?, 0)"
+                " ON CONFLICT(url) DO UPDATE SET ts = excluded.ts, status = excluded.status, err = excluded.err,"
+                " json = excluded.json, etag = excluded.etag, last_modified = excluded.last_modified,"
+                " streak = CASE WHEN excluded.status = 200 AND cache.json IS excluded.json THEN cache.streak + 1 ELSE 0 END",
+                (key, ts, status, err, blob, etag, last_modified),
+            )
 
-def load_cache(path: Path) -> Dict[str, Any]:
-    if path.exists():
+    def touch(self, key: str, ts: float) -> None:
+        """Restart key's TTL without rewriting its body (after a 304, which also counts as unchanged)."""
+        with self._lock:
+            self.conn.execute("UPDATE cache SET ts = ?, streak = streak + 1 WHERE url = ?", (ts, key))
+
+    def error_samples(self, limit: int = 5) -> List[Tuple[str, Optional[int], str]]:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT url, status, err FROM cache WHERE err IS NOT NULL AND err != '' LIMIT ?", (limit,)
+            ).fetchall()
+
+    def import_legacy_json(self, path: Path) -> int:
+        """One-time import of the old cache.json (renamed to .imported afterwards). Returns rows imported."""
+        if not path.exists():
+            return 0
         try:
-            return json.loads(path.read_text(encoding="utf-8"))
+            old = _json_loads(path.read_bytes())
         except Exception:
-            return {}
-    return {}
+            return 0
+        rows = []
+        for k, v in (old.items() if isinstance(old, dict) else []):
+            if not isinstance(v, dict):
+                continue
+            if "median" in v or "median_usd" in v:
+                obj: Any = {"median": v.get("median") if ("median" in v) else v.get("median_usd")}
+            else:
+                obj = v.get("json")
+            blob = _json_dumps(obj) if obj is not None else None
+            rows.append((str(k), float(v.get("ts") or 0), v.get("status"), v.get("err"), blob))
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("INSERT OR IGNORE INTO cache (url, ts, status, err, json) VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.execute("COMMIT")
+        _retire_imported(path)
+        return len(rows)
 
-def save_cache(path: Path, cache: Dict[str, Any]) -> None:
-    path.write_text(json.dumps(cache, indent=2, sort_keys=True), encoding="utf-8")
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
 
-def get_median(release_id: int, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int, sleep_s: float = 0.95) -> Tuple[Optional[float], Optional[int], Optional[str]]:
+# ---- Marketplace median ----
+
+def get_median(release_id: int, token: str, user_agent: str, cache: SqliteCache, ttl_days: int) -> Tuple[Optional[float], Optional[int], Optional[str]]:
     key = str(release_id)
     now = int(time.time())
-    cached = cache.get(key)
-    if isinstance(cached, dict):
-        ts = int(cached.get("ts", 0) or 0)
-        # Cache schema compatibility: only trust entries that include a median field.
-        has_median = ("median" in cached) or ("median_usd" in cached)
-        if ts and has_median and (now - ts) < ttl_days * 86400:
-            # Support old key name median_usd from earlier scripts
-            med = cached.get("median") if ("median" in cached) else cached.get("median_usd")
-            return med, cached.get("status"), cached.get("err")
-
-    url = f"{API_BASE}/marketplace/stats/{release_id}"
-    data, status, err = cached_http_get_json(url, token, user_agent, cache, ttl_days, sleep_s=sleep_s)
+    cached = cache.get(key, max_age_s=ttl_days * 86400)
+    # Cache schema compatibility: only trust entries that include a median field.
+    if cached is not None and isinstance(cached["json"], dict) and "median" in cached["json"]:
+        return cached["json"]["median"], cached["status"], cached["err"]
+
+    url = STATS_URL(release_id)
+    data, status, err = cached_http_get_json(url, token, user_agent, cache, ttl_days)
     median_f: Optional[float] = None
     if data and isinstance(data, dict):
         m = data.get("median")
@@ -288,14 +718,120 @@ def get_median(release_id: int, token: str, user_agent: str, cache: Dict[str, An
             except Exception:
                 median_f = None
 
-    cache[key] = {"ts": now, "median": median_f, "median_usd": median_f, "status": status, "err": err}
+    cache.put(key, now, status, err, {"median": median_f})
     return median_f, status, err
 
+_SUGGESTION_PRIORITY = ("Very Good (VG)", "Very Good Plus (VG+)", "Near Mint (NM or M-)", "Mint (M)")
+
+def _rows_by_condition(rows: List[Any]) -> Dict[Any, Any]:
+    by_cond: Dict[Any, Any] = {}
+    for row in rows:
+        if type(row) is dict:
+            # Only string conditions can match a lookup (and a list/dict one isn't hashable)
+            c = row.get("condition")
+            if type(c) is str:
+                by_cond.setdefault(c, row)
+    return by_cond
+
+# payload shape -> {condition: entry}; for lists the first row per condition wins.
+# Parsed JSON only ever yields plain dict/list, so dispatch is one exact-type lookup.
+_BY_CONDITION = {dict: lambda ps: ps, list: _rows_by_condition}
+
+def _price_value(ent: Any) -> Optional[float]:
+    """Float from a suggestion entry ({"value": ...} or a bare number); None if missing or unparseable."""
+    v = ent.get("value") if type(ent) is dict else ent
+    if v is None or v == "":
+        return None
+    try:
+        return float(v)
+    except Exception:
+        return None
+
+def _parse_suggestion(sugg_json: Any) -> Optional[float]:
+    """Pick the suggested price from a price_suggestions payload (default VG, then better grades)."""
+    if type(sugg_json) is not dict:
+        return None
+    ps = sugg_json.get("price_suggestions")
+    if ps is None:
+        ps = sugg_json
+    to_by_cond = _BY_CONDITION.get(type(ps))
+    if to_by_cond is None:
+        return None
+    by_cond = to_by_cond(ps)
+    values = (_price_value(by_cond.get(cond)) for cond in _SUGGESTION_PRIORITY)
+    return next((v for v in values if v is not None), None)
+
+def price_release(rid_i: int, token: str, user_agent: str, cache: SqliteCache, ttl_days: int) -> Tuple[Optional[float], Optional[float], Optional[int]]:
+    """Fetch pricing for one release. Returns (suggested, median, median_status); median is only looked up when no suggestion exists."""
+    # Prefer Discogs price suggestions by condition (default VG)
+    sugg_url = SUGG_URL(rid_i)
+    sugg_json, sugg_status, sugg_err = cached_http_get_json(sugg_url, token, user_agent, cache, ttl_days)
+    suggested = _parse_suggestion(sugg_json)
+    if suggested is not None:
+        return suggested, None, None
+    median, status, err = get_median(rid_i, token, user_agent, cache, ttl_days)
+    return None, median, status
+
+def _cached_price(rid_i: int, cache: SqliteCache, ttl_days: int) -> Optional[Tuple[Optional[float], Optional[float], Optional[int]]]:
+    """Like price_release, but from cache only. None when no usable price is cached for rid_i."""
+    max_age = float(ttl_days) * 86400.0
+    ent = cache.get(SUGG_URL(rid_i), max_age_s=max_age)
+    if ent is not None:
+        suggested = _parse_suggestion(ent["json"])
+        if suggested is not None:
+            return suggested, None, None
+    ent = cache.get(str(rid_i), max_age_s=max_age)
+    if ent is not None and isinstance(ent["json"], dict) and ent["json"].get("median") is not None:
+        return None, ent["json"]["median"], ent["status"]
+    return None
+
+def _cached_group_price(rids: List[int], cache: SqliteCache, ttl_days: int) -> Optional[Tuple[Optional[float], Optional[float], Optional[int]]]:
+    """Cached price of a group of pressings: the first variant with a usable cache entry, else None."""
+    hits = (_cached_price(rid_i, cache, ttl_days) for rid_i in rids)
+    return next((hit for hit in hits if hit is not None), None)
+
+def _apply_floor(suggested: Optional[float], median: Optional[float], status: Optional[int], floor: float, stats: Dict[str, int]) -> float:
+    """Pick the price for one group and count the outcome in stats."""
+    if suggested is not None:
+        value = float(suggested)
+    else:
+        if status == 401:
+            stats["http_401"] += 1
+        elif status == 403:
+            stats["http_403"] += 1
+        elif status == 404:
+            stats["http_404"] += 1
+        elif status == 429:
+            stats["http_429"] += 1
+        elif isinstance(status, int) and status >= 400:
+            stats["http_other"] += 1
+
+        if median is None:
+            if status is None or (isinstance(status, int) and status >= 400):
+                stats["median_errors"] += 1
+            else:
+                stats["median_missing"] += 1
+            return floor
+        value = float(median)
+    # One conversion, one floor comparison for both sources.
+    if value < floor:
+        stats["median_missing"] += 1
+        return floor
+    stats["median_ok"] += 1
+    return value
+
 # ---- Build items in legacy schema ----
 
-def build_items_from_discogs(releases: List[Dict[str, Any]], floor: float, token: str, user_agent: str, cache: Dict[str, Any], ttl_days: int, images_dir: Path, year_map: dict[int,str]) -> Tuple[List[dict], Dict[str,int]]:
+def build_items_from_discogs(releases: List[Dict[str, Any]], floor: float, token: str, user_agent: str, cache: SqliteCache, ttl_days: int, images_dir: Path, year_map: dict[int,str], workers: int = 8) -> Tuple[List[dict], Dict[str,int]]:
     groups: Dict[str, dict] = {}
-    by_key_rids: Dict[str, List[int]] = defaultdict(list)
+    sort_keys: Dict[str, Tuple[str, str]] = {}
+    by_key_rids: Dict[str, List[int]] = {}
+    # pricing worklist, filled as groups are created: (group, every rid seen for its key)
+    work: List[Tuple[dict, List[int]]] = []
+    # cover downloads, one per file (same URL -> same md5 name), fetched on a pool;
+    # covers already on disk are known from one directory scan
+    have_images = local_images(images_dir)
+    pending_images: Dict[Path, str] = {}
 
     stats = {
         "rows": 0,
@@ -313,26 +849,31 @@ def build_items_from_discogs(releases: List[Dict[str, Any]], floor: float, token
     for r in releases:
         stats["rows"] += 1
         bi = r.get("basic_information") or {}
-        rid = bi.get("id")
-        if rid is None:
-            continue
-        try:
-            rid_i = int(rid)
-        except Exception:
+        rid_i = _as_rid(bi.get("id"))
+        if rid_i is None:
             continue
 
         title = _norm(bi.get("title"))
-        artists = bi.get("artists") or []
-        artist = ""
-        if isinstance(artists, list) and artists:
-            artist = _norm(artists[0].get("name"))
+        artists = bi.get("artists")
+        artist = _norm(artists[0].get("name")) if isinstance(artists, list) and artists else ""
+
+        # later pressings of a known (artist, title) only add their rid, so
+        # everything below the key is computed once per group
+        key = _make_key(artist, title)
+        rids = by_key_rids.get(key)
+        if rids is not None:
+            rids.append(rid_i)
+            continue
+
         country = _norm(bi.get("country"))
-        labels = bi.get("labels") or []
-        label = _norm(labels[0].get("name")) if isinstance(labels, list) and labels else ""
-        catno = _norm(labels[0].get("catno")) if isinstance(labels, list) and labels else ""
+        labels = bi.get("labels")
+        first_label = labels[0] if isinstance(labels, list) and labels else None
+        label = _norm(first_label.get("name")) if first_label else ""
+        catno = _norm(first_label.get("catno")) if first_label else ""
 
         # richer format (include 7\", 10\", 78 RPM, etc when present)
-        fmt = format_display(bi) or _norm((bi.get("formats") or [{}])[0].get("name") if isinstance(bi.get("formats"), list) and bi.get("formats") else "")
+        formats = bi.get("formats")
+        fmt = format_display(bi) or (_norm(formats[0].get("name")) if isinstance(formats, list) and formats else "")
 
         # year (prefer offline_gallery records.csv mapping when available)
         year = (year_map.get(rid_i) or str(bi.get("year") or "")).strip() or ""
@@ -341,120 +882,81 @@ def build_items_from_discogs(releases: List[Dict[str, Any]], floor: float, token
         cover_url = _norm(bi.get("cover_image") or bi.get("thumb") or "")
         img_rel = ""
         if cover_url:
-            try:
-                ext = Path(urllib.parse.urlparse(cover_url).path).suffix.lower()
-                if ext not in [".jpg", ".jpeg", ".png", ".webp"]:
-                    ext = ".jpeg"
-            except Exception:
-                ext = ".jpeg"
-            fn = _md5_16(cover_url) + ext
-            out_path = images_dir / fn
-            download_image(cover_url, out_path)
+            fn = _cover_filename(cover_url)
+            if fn not in have_images:
+                pending_images.setdefault(images_dir / fn, cover_url)
             img_rel = f"images/{fn}"
 
-        key = _make_key(artist, title)
-        by_key_rids[key].append(rid_i)
-
-        if key not in groups:
-            groups[key] = {
-                "key": key,
-                "artist": artist,
-                "title": title,
-                "year": year,
-                "country": country,
-                "label": label,
-                "catno": catno,
-                "format": fmt,
-                "rid": str(rid_i),
-                "img": img_rel or cover_url,
-                "img_full_local": img_rel, "img_full_url": cover_url or "",
-                "price": "",          # string per legacy
-                "status": "available",
-                "condition": "",
-                "sleeve_condition": "",
-                "notes": "",
-            }
-
-    # price each group using the first rid for that group
-    for idx, (key, g) in enumerate(groups.items(), start=1):
-        rid_i = int(g.get("rid") or 0)
-        if idx == 1 or idx % 100 == 0:
-            print(f"Pricing {idx}/{len(groups)} ...", flush=True)
-        # Prefer Discogs price suggestions by condition (default VG)
-        suggested = None
-        sugg_url = f"{API_BASE}/marketplace/price_suggestions/{rid_i}"
-        sugg_json, sugg_status, sugg_err = cached_http_get_json(sugg_url, token, user_agent, cache, ttl_days, sleep_s=0.95)
-        if isinstance(sugg_json, dict):
-            ps = sugg_json.get("price_suggestions")
-            if ps is None:
-                ps = sugg_json
-            priority = ("Very Good (VG)", "Very Good Plus (VG+)", "Near Mint (NM or M-)", "Mint (M)")
-            if isinstance(ps, dict):
-                for cond in priority:
-                    ent = ps.get(cond)
-                    if isinstance(ent, dict):
-                        v = ent.get("value")
-                    else:
-                        v = ent
-                    try:
-                        suggested = float(v) if v not in (None, "") else None
-                    except Exception:
-                        suggested = None
-                    if suggested is not None:
-                        break
-            elif isinstance(ps, list):
-                for cond in priority:
-                    for row in ps:
-                        if isinstance(row, dict) and row.get("condition") == cond:
-                            v = row.get("value")
-                            try:
-                                suggested = float(v) if v not in (None, "") else None
-                            except Exception:
-                                suggested = None
-                            break
-                    if suggested is not None:
-                        break
-        
-        if suggested is not None:
-            if float(suggested) < floor:
-                stats["median_missing"] += 1
-                price = floor
-            else:
-                stats["median_ok"] += 1
-                price = float(suggested)
-        else:
-            median, status, err = get_median(rid_i, token, user_agent, cache, ttl_days)
-            if status == 401:
-                stats["http_401"] += 1
-            elif status == 403:
-                stats["http_403"] += 1
-            elif status == 404:
-                stats["http_404"] += 1
-            elif status == 429:
-                stats["http_429"] += 1
-            elif isinstance(status, int) and status >= 400:
-                stats["http_other"] += 1
-        
-            if median is None:
-                if status is None or (isinstance(status, int) and status >= 400):
-                    stats["median_errors"] += 1
-                else:
-                    stats["median_missing"] += 1
-                price = floor
-            else:
-                if float(median) < floor:
-                    stats["median_missing"] += 1
-                    price = floor
-                else:
-                    stats["median_ok"] += 1
-                    price = float(median)
-        g["price"] = str(int(round(price)))
+        sort_keys[key] = (artist.casefold(), title.casefold())
+        # The grouping key stays server-side; the page builds its own search text.
+        groups[key] = g = {
+            "artist": artist,
+            "title": title,
+            # low-cardinality columns share one string object per distinct value
+            "year": intern(year),
+            "country": intern(country),
+            "label": intern(label),
+            "catno": catno,
+            "format": intern(fmt),
+            "rid": str(rid_i),
+            "img": img_rel or cover_url,
+            "img_full_local": img_rel, "img_full_url": cover_url or "",
+            "price": "",          # string per legacy
+            "status": "available",
+            "condition": "",
+            "sleeve_condition": "",
+            "notes": "",
+        }
+        by_key_rids[key] = rids = [rid_i]
+        work.append((g, rids))
+
+    # covers download on their own pool while pricing runs; only rows that
+    # start a group are shown, so later variants' covers are never fetched.
+    img_ex = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for out_path, cover_url in pending_images.items():
+            img_ex.submit(download_image, cover_url, out_path)
+
+        # pass 1: a cached price from any of a group's rids, looked up serially
+        # (warm runs never touch the pool).
+        priced = [_cached_group_price(rids, cache, ttl_days) for _, rids in work]
+        misses = [i for i, p in enumerate(priced) if p is None]
+        print(f"Pricing: {len(work) - len(misses)} cached, {len(misses)} to fetch", flush=True)
+        # pass 2: fetch the first rid of each miss on a bounded pool (RATE_LIMITER paces them).
+        if misses:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+                fetched = ex.map(lambda i: price_release(work[i][1][0], token, user_agent, cache, ttl_days), misses)
+                for n, (i, res) in enumerate(zip(misses, fetched), start=1):
+                    if n == 1 or n % 100 == 0:
+                        print(f"Pricing {n}/{len(misses)} ...", flush=True)
+                    priced[i] = res
+        # pass 3: floor and stats in group order, so the output is deterministic.
+        for (g, _), (suggested, median, status) in zip(work, priced):
+            price = _apply_floor(suggested, median, status, floor, stats)
+            g["price"] = str(int(round(price)))
+    except BaseException:
+        # pricing failed: drop the covers still queued instead of downloading them on
+        img_ex.shutdown(wait=True, cancel_futures=True)
+        raise
+    img_ex.shutdown(wait=True)
 
-    items = list(groups.values())
-    items.sort(key=lambda x: ((x.get("artist") or "").lower(), (x.get("title") or "").lower()))
+    # sort on (artist, title) keys casefolded once per group at creation
+    items = [groups[k] for k in sorted(groups, key=sort_keys.__getitem__)]
     stats["groups"] = len(items)
     return items, stats
 
+def write_inventory(path: Path, items: List[dict]) -> None:
+    """Stream {"items": [...]} to disk one item per line (never holds the whole document as one string)."""
+    # Written beside the target and swapped in, so a crash never leaves a truncated inventory
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(b'{"items": [')
+        for i, it in enumerate(items):
+            f.write(b",\n" if i else b"\n")
+            f.write(_json_dumps(it))
+        f.write(b"\n]}\n")
+    os.replace(tmp, path)
+
 # ---- Main ----
 
 def main() -> int:
@@ -470,6 +972,8 @@ def main() -> int:
     folders_str = env("DISCOGS_FOLDERS")
     floor = float(env("STORE_MIN_PRICE", "5") or "5")
     ttl_days = int(env("STORE_CACHE_TTL_DAYS", "14") or "14")
+    workers = int(env("STORE_HTTP_WORKERS", "8") or "8")
+    RATE_LIMITER.max_calls = max(1, int(env("STORE_RATE_PER_MIN", "55") or "55"))
 
     if not token:
         print("ERROR: DISCOGS_TOKEN missing.", flush=True)
@@ -488,7 +992,7 @@ def main() -> int:
 
     OUT_ROOT = records_out / "store"
     SITE_DIR = OUT_ROOT / "site"
-    CACHE_PATH = OUT_ROOT / "cache.json"
+    CACHE_PATH = OUT_ROOT / "cache.sqlite"
     ensure_dir(SITE_DIR)
     IMAGES_DIR = SITE_DIR / "images"
     ensure_dir(IMAGES_DIR)
@@ -496,95 +1000,68 @@ def main() -> int:
     # Optional: use offline_gallery years if available
     year_map = load_year_map(records_out / "offline_gallery" / "records.csv")
 
-    print("=== Store Data Builder (Discogs fetch + pricing + inventory json) ===", flush=True)
-    print(f"DISCOGS user: {username}", flush=True)
-    print(f"Folders: {len(folders)}", flush=True)
-    for fn, fid in folders:
-        print(f"  - {fn} ({fid})", flush=True)
-    print(f"Floor: ${int(floor)}", flush=True)
-    print(f"Output site: {SITE_DIR}", flush=True)
-    print(f"Cache: {CACHE_PATH}", flush=True)
-
-    # Fetch releases across *all* folders listed in DISCOGS_FOLDERS, then de-dupe by release_id.
-    releases_all: List[Dict[str, Any]] = []
-    combined_stats = {"pages": 0, "http_errors": 0}
-    for fn, fid in folders:
-        releases_url = f"{API_BASE}/users/{urllib.parse.quote(username)}/collection/folders/{fid}/releases"
-        rels, rel_stats = paged_releases(releases_url, token, user_agent, per_page=100)
-        releases_all.extend(rels)
-        combined_stats["pages"] += int(rel_stats.get("pages", 0) or 0)
-        combined_stats["http_errors"] += int(rel_stats.get("http_errors", 0) or 0)
-        print(f"Folder fetched: {fn} ({fid}) | pages: {rel_stats.get('pages',0)} | rows: {len(rels)} | http_errors: {rel_stats.get('http_errors',0)}", flush=True)
-
-    # De-dupe by Discogs release_id (basic_information.id)
+    banner = ["=== Store Data Builder (Discogs fetch + pricing + inventory json) ===", f"DISCOGS user: {username}", f"Folders: {len(folders)}"]
+    banner.extend(f"  - {fn} ({fid})" for fn, fid in folders)
+    banner += [f"Floor: ${int(floor)}", f"Output site: {SITE_DIR}", f"Cache: {CACHE_PATH}"]
+    print("\n".join(banner), flush=True)
+
+    # Fetch releases across *all* folders listed in DISCOGS_FOLDERS, de-duped by
+    # Discogs release_id (basic_information.id) page by page as they arrive.
     seen_rids: set[int] = set()
     releases: List[Dict[str, Any]] = []
-    dup_rows = 0
-    for rr in releases_all:
-        bi = rr.get("basic_information") or {}
-        rid = bi.get("id")
-        if rid is None:
-            continue
-        try:
-            rid_i = int(rid)
-        except Exception:
-            continue
-        if rid_i in seen_rids:
-            dup_rows += 1
-            continue
-        seen_rids.add(rid_i)
-        releases.append(rr)
+    combined_stats = {"pages": 0, "http_errors": 0, "rows": 0, "dups": 0}
+    folders_url = f"{API_BASE}/users/{urllib.parse.quote(username)}/collection/folders"
+    for fn, fid in folders:
+        releases_url = f"{folders_url}/{fid}/releases"
+        rels, rel_stats = paged_releases(releases_url, token, user_agent, per_page=100, seen_rids=seen_rids)
+        releases.extend(rels)
+        for k in combined_stats:
+            combined_stats[k] += int(rel_stats.get(k, 0) or 0)
+        print(f"Folder fetched: {fn} ({fid}) | pages: {rel_stats.get('pages',0)} | rows: {rel_stats.get('rows',0)} | http_errors: {rel_stats.get('http_errors',0)}", flush=True)
 
     print(
-        f"Collection API pages (sum): {combined_stats.get('pages',0)} | rows (raw): {len(releases_all)} | rows (dedup by release_id): {len(releases)} | dup_rows_dropped: {dup_rows} | http_errors (sum): {combined_stats.get('http_errors',0)}",
+        f"Collection API pages (sum): {combined_stats.get('pages',0)} | rows (raw): {combined_stats.get('rows',0)} | rows (dedup by release_id): {len(releases)} | dup_rows_dropped: {combined_stats.get('dups',0)} | http_errors (sum): {combined_stats.get('http_errors',0)}",
         flush=True,
     )
-    # Quick live probe: attempt marketplace stats for first release_id to capture raw failure mode
+    # Optional live probe (STORE_PROBE=1): attempt marketplace stats for the first
+    # release_id to capture the raw failure mode. Off by default: it is an uncached
+    # call in front of all real work on every run.
     probe_rid = None
-    for rr in releases:
-        bi = rr.get("basic_information") or {}
-        rid = bi.get("id")
-        if rid is not None:
-            try:
-                probe_rid = int(rid)
-                break
-            except Exception:
-                pass
+    if (env("STORE_PROBE", "0") or "0") == "1":
+        rids = (_as_rid((rr.get("basic_information") or {}).get("id")) for rr in releases)
+        probe_rid = next((rid for rid in rids if rid is not None), None)
     if probe_rid:
-        probe_url = f"{API_BASE}/marketplace/stats/{probe_rid}"
-        d, st, er = http_get_json(probe_url, token, user_agent, sleep_s=0.0)
+        probe_url = STATS_URL(probe_rid)
+        d, st, er = http_get_json(probe_url, token, user_agent)
         print(f"Marketplace probe rid={probe_rid} status={st} err={er}", flush=True)
 
-    cache = load_cache(CACHE_PATH)
-    items, price_stats = build_items_from_discogs(releases, floor, token, user_agent, cache, ttl_days, IMAGES_DIR, year_map)
-    save_cache(CACHE_PATH, cache)
+    cache = SqliteCache(CACHE_PATH)
+    imported = cache.import_legacy_json(OUT_ROOT / "cache.json")
+    if imported:
+        print(f"Imported {imported} entries from legacy cache.json", flush=True)
+    items, price_stats = build_items_from_discogs(releases, floor, token, user_agent, cache, ttl_days, IMAGES_DIR, year_map, workers)
 
     inv_path = SITE_DIR / "store_inventory.json"
-    inv_path.write_text(json.dumps({"items": items}, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_inventory(inv_path, items)
     print(f"Wrote: {inv_path}", flush=True)
 
-    # Pricing diagnostics
-    print("--- Pricing diagnostics ---", flush=True)
+    # Pricing diagnostics, collected and written in one go
+    diag = ["--- Pricing diagnostics ---"]
     # Always show up to 5 sample errors from marketplace stats calls
     if price_stats.get("median_errors", 0) > 0:
-        samples = []
-        for rid, v in cache.items():
-            if isinstance(v, dict):
-                err = v.get("err")
-                status = v.get("status")
-                if err:
-                    samples.append((rid, status, err))
+        samples = cache.error_samples(5)
         if samples:
-            print("sample_marketplace_errors:", flush=True)
-            for rid, status, err in samples[:5]:
-                print(f"  rid={rid} status={status} err={err}", flush=True)
+            diag.append("sample_marketplace_errors:")
+            diag.extend(f"  rid={rid} status={status} err={err}" for rid, status, err in samples[:5])
         else:
-            print("sample_marketplace_errors: (none recorded in cache)", flush=True)
+            diag.append("sample_marketplace_errors: (none recorded in cache)")
     for k in ["groups","median_ok","median_missing","median_errors","http_401","http_403","http_404","http_429","http_other"]:
-        print(f"{k}: {price_stats.get(k,0)}", flush=True)
+        diag.append(f"{k}: {price_stats.get(k,0)}")
     if price_stats.get("http_429",0) > 0:
-        print("NOTE: HTTP 429 indicates rate limiting; rerun later or increase cache TTL.", flush=True)
+        diag.append("NOTE: HTTP 429 indicates rate limiting; rerun later or increase cache TTL.")
+    print("\n".join(diag), flush=True)
 
+    cache.close()
     print("Done.", flush=True)
     return 0
 
@@ -4,22 +4,62 @@
 
 from __future__ import annotations
 
+import gzip
+import json
 import os
+import re
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON from UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8", errors="replace"))
+
+
+def _json_dumps(obj: Any, pretty: bool = False) -> bytes:
+    """UTF-8 JSON bytes, compact unless pretty (2-space indent)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_inventory(path: Path, inv: Any, pretty: bool = False) -> None:
+    """Atomically write the inventory back; a plain {"items": [...]} is streamed one item per line like store_data.py writes it."""
+    tmp = path.with_name(path.name + ".tmp")
+    if pretty or not (isinstance(inv, dict) and list(inv) == ["items"] and isinstance(inv["items"], list)):
+        tmp.write_bytes(_json_dumps(inv, pretty=pretty))
+    else:
+        with tmp.open("wb") as f:
+            f.write(b'{"items": [')
+            for i, it in enumerate(inv["items"]):
+                f.write(b",\n" if i else b"\n")
+                f.write(_json_dumps(it))
+            f.write(b"\n]}\n")
+    os.replace(tmp, path)
+
+
+# KEY=VALUE per line; leading/trailing blanks trimmed, lines starting with "#" skipped.
+_ENV_LINE_RE = re.compile(r"^[ \t]*([^\s#=][^=\r\n]*?)[ \t]*=[ \t]*(.*?)[ \t\r]*$", re.M)
+
 
 def load_env_file(path: Path) -> None:
     if not path.exists():
         return
     try:
-        for line in path.read_text(encoding="utf-8", errors="replace").splitlines():
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            k, v = line.split("=", 1)
-            k = k.strip()
-            v = v.strip()
-            if k and k not in os.environ:
+        text = path.read_bytes().decode("utf-8", errors="replace")
+        for m in _ENV_LINE_RE.finditer(text):
+            k, v = m.group(1), m.group(2)
+            if k not in os.environ:
                 os.environ[k] = v
     except Exception:
         return
@@ -36,6 +76,22 @@ def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
 
+def _minify_html(html: str) -> bytes:
+    """UTF-8 bytes with indentation and blank lines dropped."""
+    # Line structure is kept so // comments and ASI in the inline script stay intact.
+    return ("\n".join(line.strip() for line in html.splitlines() if line.strip()) + "\n").encode("utf-8")
+
+
+def _emit_html(dst: Path, data: bytes, gz: bool = False) -> None:
+    """Write dst; with gz also a precompressed <dst>.gz, otherwise drop any stale one."""
+    dst.write_bytes(data)
+    gz_path = dst.with_name(dst.name + ".gz")
+    if gz:
+        gz_path.write_bytes(gzip.compress(data, 9, mtime=0))
+    else:
+        gz_path.unlink(missing_ok=True)
+
+
 HTML = """<!doctype html>
 <html lang="en">
 <head>
@@ -117,13 +173,13 @@ HTML = """<!doctype html>
     <table id="tbl" aria-label="Store inventory" style="display:none">
       <thead>
         <tr>
-          <th class="nowrap">price</th>
+          <th class="nowrap" data-key="price">price</th>
           <th class="nowrap noclick">+ / −</th>
           <th class="nowrap noclick">cover</th>
-          <th>artist</th>
-          <th>title</th>
-          <th class="nowrap">year</th>
-          <th class="nowrap">format</th>
+          <th data-key="artist">artist</th>
+          <th data-key="title">title</th>
+          <th class="nowrap" data-key="year">year</th>
+          <th class="nowrap" data-key="format">format</th>
         </tr>
       </thead>
       <tbody id="tbody"></tbody>
@@ -168,16 +224,22 @@ HTML = """<!doctype html>
   <script>
   (function(){
     const $ = (id)=>document.getElementById(id);
+    // Reused collators: compare() skips the per-call locale/options setup of localeCompare.
+    const CMP = new Intl.Collator(undefined, { sensitivity:"base" }).compare;
+    const CMP_NUM = new Intl.Collator(undefined, { numeric:true, sensitivity:"base" }).compare;
 
-    const state = { items: [], filtered: [], cart: {} };
+    const state = { items: [], filtered: [], cart: {}, byRid: new Map() };
     const CART_KEY = "store_cart_v1";
 
     function loadCart(){ try{ state.cart = JSON.parse(localStorage.getItem(CART_KEY)||"{}")||{}; }catch{ state.cart={}; } }
-    function saveCart(){ try{ localStorage.setItem(CART_KEY, JSON.stringify(state.cart||{})); }catch(e){} }
-
-    function money(x){
-      const n = Number(String(x||"").replace(/[^0-9.]/g,""));
-      return isFinite(n) && n>0 ? "$" + n.toFixed(0) : "";
+    function writeCart(){ try{ localStorage.setItem(CART_KEY, JSON.stringify(state.cart||{})); }catch(e){} }
+    // Clicks only mark the cart dirty; one idle-time write persists them all (flushed on pagehide).
+    let cartDirty = false;
+    function flushCart(){ if(cartDirty){ cartDirty = false; writeCart(); } }
+    function saveCart(){
+      if(cartDirty) return;
+      cartDirty = true;
+      (window.requestIdleCallback || setTimeout)(flushCart);
     }
 
     function ridOf(it){ return String(it.release_id || it.rid || it.id || it.key || ""); }
@@ -188,9 +250,10 @@ HTML = """<!doctype html>
       return Number.isFinite(n) && n>0 ? String(n) : "";
     }
 
+    // Reads the cached __yearNum, so indexItems sets that first.
     function computeDecade(it){
-      const y = Number(computeYear(it));
-      if(Number.isFinite(y) && y>0){
+      const y = it.__yearNum;
+      if(y>0){
         const d = Math.floor(y/10)*10;
         return String(d) + "s";
       }
@@ -207,58 +270,84 @@ HTML = """<!doctype html>
     function searchBlob(it){
       const parts = [
         it.artist, it.title, it.label, it.catno, it.format,
-        computeYear(it), computeGenre(it), computeDecade(it),
+        it.__year, it.__genre, it.__decade,
       ].filter(Boolean).map(x=>String(x).toLowerCase());
       return parts.join(" ");
     }
 
+    function debounce(fn, ms){
+      let t;
+      return (...a)=>{ clearTimeout(t); t = setTimeout(()=>fn(...a), ms); };
+    }
+
+    const HTML_ESC = { "&":"&amp;", "<":"&lt;", ">":"&gt;", '"':"&quot;", "'":"&#39;" };
+    const HTML_RE = /[&<>"']/g;
     function escapeHtml(s){
-      return String(s||"")
-        .replaceAll("&","&amp;")
-        .replaceAll("<","&lt;")
-        .replaceAll(">","&gt;")
-        .replaceAll('"',"&quot;")
-        .replaceAll("'","&#39;");
+      return String(s||"").replace(HTML_RE, c=>HTML_ESC[c]);
     }
 
-    function cartSummary(){
-      const lines = [];
-      const cartItems = [];
-      let total = 0, count = 0;
+    // Per-rid cart entries (text block, qty, line price), kept in sync with state.cart
+    // one rid at a time so a +/- click never rebuilds the whole cart.
+    const cartCache = { entries: new Map(), count: 0, total: 0 };
+
+    function cartEntry(rid){
+      const qty = state.cart[rid]||0;
+      if(qty<=0) return null;
+      const it = state.byRid.get(rid);
+      if(!it) return null;
+
+      const p = it.__priceNum;
+      const linePrice = p>0 ? p*qty : 0;
+
+      const year = it.__year || "?";
+      const lines = [`${qty}x ${it.artist} — ${it.title} (${year}) [${rid}] ${it.__priceStr}`.trim()];
+      if(it.status && String(it.status).toLowerCase()!=="available") lines.push(`   Status: ${it.status}`);
+      if(it.condition) lines.push(`   Condition: ${it.condition}`);
+      if(it.notes) lines.push(`   Notes: ${it.notes}`);
+      if(it.qty && Number(it.qty)>1) lines.push(`   Copies/Variants in stock: ${it.qty}`);
+
+      return {
+        text: lines.join("\\n"), qty, price: linePrice,
+        item: { rid, qty, artist: it.artist||"", title: it.title||"", year: year },
+      };
+    }
 
-      lines.push("Record order inquiry:");
-      lines.push("");
+    function setCartEntry(rid){
+      const old = cartCache.entries.get(rid);
+      if(old){
+        cartCache.count -= old.qty;
+        cartCache.total -= old.price;
+        cartCache.entries.delete(rid);
+      }
+      const e = cartEntry(rid);
+      if(e){
+        cartCache.entries.set(rid, e);
+        cartCache.count += e.qty;
+        cartCache.total += e.price;
+      }
+    }
 
-      Object.keys(state.cart).sort().forEach(rid=>{
-        const qty = state.cart[rid]||0;
-        if(qty<=0) return;
-        const it = state.items.find(x=>ridOf(x)===rid);
-        if(!it) return;
-
-        const p = Number(String(it.price||"").replace(/[^0-9.]/g,""));
-        const linePrice = (isFinite(p)&&p>0) ? p*qty : 0;
-        if(linePrice) total += linePrice;
-        count += qty;
-
-        const year = computeYear(it) || "?";
-        lines.push(`${qty}x ${it.artist} — ${it.title} (${year}) [${rid}] ${money(it.price) || ""}`.trim());
-        if(it.status && String(it.status).toLowerCase()!=="available") lines.push(`   Status: ${it.status}`);
-        if(it.condition) lines.push(`   Condition: ${it.condition}`);
-        if(it.notes) lines.push(`   Notes: ${it.notes}`);
-        if(it.qty && Number(it.qty)>1) lines.push(`   Copies/Variants in stock: ${it.qty}`);
-
-        cartItems.push({ rid, qty, artist: it.artist||"", title: it.title||"", year: year });
-      });
+    function rebuildCartEntries(){
+      cartCache.entries.clear();
+      cartCache.count = 0;
+      cartCache.total = 0;
+      Object.keys(state.cart).forEach(setCartEntry);
+    }
 
+    const CART_HEAD = ["Record order inquiry:", ""];
+    const CART_FOOT = ["", "Name:", "Pickup or Shipping (zip):", "Payment preference:"];
+
+    function cartSummary(){
+      const { count, total } = cartCache;
+      const rids = Array.from(cartCache.entries.keys()).sort();
+      const lines = CART_HEAD.slice();
+      rids.forEach(rid=>lines.push(cartCache.entries.get(rid).text));
       lines.push("");
       lines.push(`Items: ${count}`);
       if(total>0) lines.push(`Total: $${total.toFixed(0)}`);
-      lines.push("");
-      lines.push("Name:");
-      lines.push("Pickup or Shipping (zip):");
-      lines.push("Payment preference:");
+      lines.push(...CART_FOOT);
 
-      return { text: lines.join("\\n"), total, count, cartItems };
+      return { text: lines.join("\\n"), total, count, cartItems: rids.map(rid=>cartCache.entries.get(rid).item) };
     }
 
     function renderCartList(cartItems){
@@ -276,19 +365,20 @@ HTML = """<!doctype html>
             <button class="btn" data-action="remove" data-rid="${escapeHtml(ci.rid)}">Remove</button>
           </div>`;
       }).join("");
+    }
 
-      el.querySelectorAll("button[data-action]").forEach(btn=>{
-        btn.addEventListener("click", ()=>{
-          const rid = btn.getAttribute("data-rid");
-          delete state.cart[rid];
-          saveCart(); updateCartButton(); render();
-          openCart(); // refresh modal contents
-        });
-      });
+    function onCartListClick(e){
+      const btn = e.target.closest("button[data-action]");
+      if(!btn) return;
+      const rid = btn.getAttribute("data-rid");
+      delete state.cart[rid];
+      setCartEntry(rid);
+      saveCart(); updateCartButton(); render();
+      openCart(); // refresh modal contents
     }
 
     function updateCartButton(){
-      const {count, total} = cartSummary();
+      const {count, total} = cartCache;
       $("cartOpen").textContent = total>0 ? `Cart (${count}) — $${total.toFixed(0)}` : `Cart (${count})`;
     }
 
@@ -314,24 +404,47 @@ HTML = """<!doctype html>
       $("helpModal").setAttribute("aria-hidden","true");
     }
 
-    function setFilterOptions(){
-      const artists = [...new Set(state.items.map(x=>x.artist).filter(Boolean))].sort((a,b)=>a.localeCompare(b));
-      const genres  = [...new Set(state.items.map(x=>computeGenre(x)))].sort((a,b)=>a.localeCompare(b));
-      const decades = [...new Set(state.items.map(x=>computeDecade(x)))].sort((a,b)=>a.localeCompare(b));
-
-      function fill(sel, label, arr){
-        const cur = sel.value;
-        sel.innerHTML = `<option value="">${label}</option>`;
-        arr.forEach(v=>{
-          const o = document.createElement("option");
-          o.value=v; o.textContent=v;
-          sel.appendChild(o);
-        });
-        if(arr.includes(cur)) sel.value = cur;
+    // One pass after load: derived per-item fields, rid index, sorted option lists.
+    function indexItems(){
+      for(const it of state.items){
+        it.__rid = ridOf(it);
+        it.__year = computeYear(it);
+        it.__yearNum = Number(it.__year) || 0;
+        it.__genre = computeGenre(it);
+        it.__decade = computeDecade(it);
+        it.__blob = searchBlob(it);
+        const p = Number(String(it.price||"").replace(/[^0-9.]/g,"")) || 0;
+        it.__priceNum = isFinite(p) ? p : 0;
+        it.__priceStr = it.__priceNum>0 ? "$" + Math.round(it.__priceNum) : "";
+        it.__url = "https://www.discogs.com/release/" + encodeURIComponent(it.__rid);
       }
-      fill($("artist"), "All artists", artists);
-      fill($("genre"), "All genres", genres);
-      fill($("decade"), "All decades", decades);
+      // rid -> item index (cart lookups without scanning all items)
+      state.byRid = new Map(state.items.map(it=>[it.__rid, it]));
+
+      state._artistOpts = [...new Set(state.items.map(x=>x.artist).filter(Boolean))].sort(CMP);
+      state._genreOpts  = [...new Set(state.items.map(x=>x.__genre))].sort(CMP);
+      state._decadeOpts = [...new Set(state.items.map(x=>x.__decade))].sort(CMP);
+    }
+
+    function fillSelect(sel, label, arr){
+      const cur = sel.value;
+      sel.innerHTML = `<option value="">${label}</option>`;
+      arr.forEach(v=>{
+        const o = document.createElement("option");
+        o.value=v; o.textContent=v;
+        sel.appendChild(o);
+      });
+      if(arr.includes(cur)) sel.value = cur;
+    }
+
+    function setFilterOptions(){
+      // Options depend only on state.items, so build them once after load.
+      if(state._optsBuilt) return;
+      state._optsBuilt = true;
+
+      fillSelect($("artist"), "All artists", state._artistOpts);
+      fillSelect($("genre"), "All genres", state._genreOpts);
+      fillSelect($("decade"), "All decades", state._decadeOpts);
     }
 
     function applyFilters(){
@@ -340,16 +453,31 @@ HTML = """<!doctype html>
       const g = $("genre").value;
       const d = $("decade").value;
 
-      state.filtered = state.items.filter(it=>{
-        const blob = it.__blob || "";
-        if(q && !blob.includes(q)) return false;
-        if(a && it.artist !== a) return false;
-        if(g && computeGenre(it) !== g) return false;
-        if(d && computeDecade(it) !== d) return false;
-        return true;
-      });
+      if(!q && !a && !g && !d){
+        // Copy, not alias: sortFiltered sorts state.filtered in place.
+        state.filtered = state.items.slice();
+      }else{
+        const out = [];
+        for(const it of state.items){
+          if(q && !it.__blob.includes(q)) continue;
+          if(a && it.artist !== a) continue;
+          if(g && it.__genre !== g) continue;
+          if(d && it.__decade !== d) continue;
+          out.push(it);
+        }
+        state.filtered = out;
+      }
+      sortFiltered();
+
+      scheduleRender();
+    }
 
-      render();
+    // Coalesce filter-driven renders into the next animation frame.
+    let renderQueued = false;
+    function scheduleRender(){
+      if(renderQueued) return;
+      renderQueued = true;
+      requestAnimationFrame(()=>{ renderQueued = false; render(); });
     }
 
     // --- Image hover preview (offline_gallery style) ---
@@ -361,17 +489,22 @@ HTML = """<!doctype html>
       const hoverImg = hoverOverlay.querySelector("img");
       let currentImg = null;
 
+      // Viewport and overlay sizes are cached: viewport until resize, overlay until
+      // the next show()/image load, so a scroll reposition reads only the thumb's rect.
+      let vw = window.innerWidth;
+      let vh = window.innerHeight;
+      let overlayW = -1, overlayH = 0;
+
       function positionNearThumb(img){
         const pad = 10;
         const r = img.getBoundingClientRect();
-        const vw = window.innerWidth;
-        const vh = window.innerHeight;
-
-        // ensure overlay has size
-        hoverOverlay.style.display = "block";
-        const rect = hoverOverlay.getBoundingClientRect();
-        const w = rect.width || 0;
-        const h = rect.height || 0;
+        if(overlayW < 0){
+          const rect = hoverOverlay.getBoundingClientRect();
+          overlayW = rect.width || 0;
+          overlayH = rect.height || 0;
+        }
+        const w = overlayW;
+        const h = overlayH;
 
         // prefer right, else left
         let left = r.right + pad;
@@ -393,9 +526,17 @@ HTML = """<!doctype html>
         currentImg = img;
         hoverImg.src = src;
         hoverOverlay.style.display = "block";
+        overlayW = -1;
         positionNearThumb(img);
       }
 
+      // The preview's size is only known once it loads; re-measure then.
+      hoverImg.addEventListener("load", ()=>{
+        if(!currentImg) return;
+        overlayW = -1;
+        positionNearThumb(currentImg);
+      });
+
       function hide(){
         currentImg = null;
         hoverOverlay.style.display = "none";
@@ -414,163 +555,142 @@ HTML = """<!doctype html>
         }
       });
 
-      window.addEventListener("scroll", ()=>{
-        if(currentImg) positionNearThumb(currentImg);
-      }, {passive:true});
+      // Reposition at most once per frame while scrolling/resizing.
+      let repositionQueued = false;
+      function queueReposition(){
+        if(!currentImg || repositionQueued) return;
+        repositionQueued = true;
+        requestAnimationFrame(()=>{
+          repositionQueued = false;
+          if(currentImg) positionNearThumb(currentImg);
+        });
+      }
+      window.addEventListener("scroll", queueReposition, {passive:true});
       window.addEventListener("resize", ()=>{
-        if(currentImg) positionNearThumb(currentImg);
+        vw = window.innerWidth;
+        vh = window.innerHeight;
+        overlayW = -1;
+        queueReposition();
       });
     }
 
-    // --- Click-to-sort tables by clicking header cells (offline_gallery style) ---
-    function makeTableSortable(table){
-      if(!table) return;
-      const thead = table.querySelector("thead");
-      const tbody = table.querySelector("tbody");
-      if(!thead || !tbody) return;
+    // --- Click-to-sort by header cell (offline_gallery style) ---
+    // Sorts state.filtered rather than DOM rows, since only a window of rows is in the DOM.
+    function sortValue(it, key){
+      if(key === "price") return it.__priceNum;
+      if(key === "year") return it.__yearNum;
+      return String(it[key] || "").trim();
+    }
 
-      const ths = Array.from(thead.querySelectorAll("th"));
-      const sortState = { idx: -1, dir: 1 };
+    function sortFiltered(){
+      const s = state.sort;
+      if(!s) return;
+      const numeric = (s.key === "price" || s.key === "year");
+      state.filtered.sort((a, b)=>{
+        const av = sortValue(a, s.key);
+        const bv = sortValue(b, s.key);
+        return s.dir * (numeric ? av - bv : CMP_NUM(av, bv));
+      });
+    }
 
-      function cellText(tr, idx){
-        const td = tr.children[idx];
-        if(!td) return "";
-        const ds = td.getAttribute("data-sort");
-        return (ds || td.textContent || "").trim();
-      }
+    function installSort(){
+      document.querySelectorAll("#tbl th[data-key]").forEach(th=>{
+        th.title = "Click to sort";
+        th.addEventListener("click", ()=>{
+          const key = th.getAttribute("data-key");
+          const dir = (state.sort && state.sort.key === key) ? -state.sort.dir : 1;
+          state.sort = { key, dir };
+          sortFiltered();
+          render();
+        });
+      });
+    }
 
-      function cmp(a, b, idx){
-        const ha = (ths[idx]?.textContent || "").toLowerCase();
-        const av = cellText(a, idx);
-        const bv = cellText(b, idx);
-
-        if(ha.includes("price") || ha.includes("year")){
-          const an = Number(av);
-          const bn = Number(bv);
-          const aok = Number.isFinite(an);
-          const bok = Number.isFinite(bn);
-          if(aok && bok) return an - bn;
-          if(aok && !bok) return -1;
-          if(!aok && bok) return 1;
-        }
-        return av.localeCompare(bv, undefined, { numeric:true, sensitivity:"base" });
-      }
+    function rowHtml(it){
+      const rid = it.__rid;
+      const year = it.__year;
+      const img = it.img || "";
+      const fullImg = it.img_full_local || it.img_full_url || img || "";
+      const alt = (it.artist||"") + " — " + (it.title||"");
+
+      const inCart = state.cart[rid] ? 1 : 0;
+
+      return `<tr class="${inCart ? "incart" : ""}" data-rid="${escapeHtml(rid)}">`
+        + `<td class="nowrap">${it.__priceStr}</td>`
+        + `<td class="nowrap"><div class="iconstack">`
+        +   `<button class="iconbtn" type="button" data-action="add"${inCart > 0 ? " disabled" : ""}>+</button>`
+        +   `<button class="iconbtn" type="button" data-action="remove"${inCart <= 0 ? " disabled" : ""}>−</button>`
+        + `</div></td>`
+        + `<td><img class="thumb" loading="lazy" src="${escapeHtml(img)}" alt="${escapeHtml(alt)}" data-full="${escapeHtml(fullImg || img)}"></td>`
+        + `<td>${escapeHtml(it.artist)}</td>`
+        + `<td><a class="dlink" href="${it.__url}" target="_blank" rel="noreferrer">${escapeHtml(it.title)}</a></td>`
+        + `<td class="nowrap">${escapeHtml(year)}</td>`
+        + `<td class="nowrap">${escapeHtml(it.format)}</td>`
+        + `</tr>`;
+    }
+
+    // --- Windowed table body: only rows near the viewport are in the DOM ---
+    // Spacer rows above/below stand in for the rest, sized with an estimated row
+    // height (measured from the first rendered row).
+    const OVERSCAN = 12;
+    const win = { rowH: 81, measured: false, start: -1, end: -1, queued: false };
+
+    function spacerRow(h){
+      return h > 0 ? `<tr class="spacer" aria-hidden="true"><td colspan="7" style="height:${h}px;padding:0;border:0"></td></tr>` : "";
+    }
 
-      function sortBy(idx){
-        const rows = Array.from(tbody.querySelectorAll("tr"));
-        const dir = (sortState.idx === idx) ? -sortState.dir : 1;
-        sortState.idx = idx; sortState.dir = dir;
-        rows.sort((ra, rb) => dir * cmp(ra, rb, idx));
-        rows.forEach(r => tbody.appendChild(r));
+    function renderWindow(force){
+      const tbody = $("tbody");
+      const n = state.filtered.length;
+      const top = tbody.getBoundingClientRect().top;
+      const first = Math.min(n, Math.floor(Math.max(0, -top) / win.rowH));
+      const start = Math.max(0, first - OVERSCAN);
+      const end = Math.min(n, first + Math.ceil(window.innerHeight / win.rowH) + OVERSCAN);
+      if(!force && start === win.start && end === win.end) return;
+      win.start = start; win.end = end;
+
+      tbody.innerHTML = spacerRow(start * win.rowH)
+        + state.filtered.slice(start, end).map(rowHtml).join("")
+        + spacerRow((n - end) * win.rowH);
+
+      if(!win.measured){
+        const tr = tbody.querySelector("tr[data-rid]");
+        const h = tr ? tr.getBoundingClientRect().height : 0;
+        if(h > 0){
+          win.measured = true;
+          if(Math.abs(h - win.rowH) > 0.5){ win.rowH = h; renderWindow(true); }
+        }
       }
+    }
 
-      ths.forEach((th, idx)=>{
-        if(th.classList.contains("noclick")) return;
-        th.title = "Click to sort";
-        th.addEventListener("click", () => sortBy(idx));
-      });
+    function onScroll(){
+      if(win.queued) return;
+      win.queued = true;
+      requestAnimationFrame(()=>{ win.queued = false; renderWindow(false); });
     }
 
+    let tableShown = false;
     function render(){
       $("status").textContent = `${state.filtered.length} shown / ${state.items.length} total`;
-      const tbody = $("tbody");
-      tbody.innerHTML = "";
-
-      for(const it of state.filtered){
-        const rid = ridOf(it);
-        const priceNum = Number(String(it.price||"").replace(/[^0-9.]/g,"")) || 0;
-        const year = computeYear(it);
-        const img = it.img || "";
-        const fullImg = it.img_full_local || it.img_full_url || img || "";
-        const url = "https://www.discogs.com/release/" + encodeURIComponent(rid);
-
-        const inCart = state.cart[rid] ? 1 : 0;
-
-        const tr = document.createElement("tr");
-        tr.className = inCart ? "incart" : "";
-
-        const tdPrice = document.createElement("td");
-        tdPrice.className = "nowrap";
-        tdPrice.setAttribute("data-sort", String(priceNum));
-        tdPrice.textContent = priceNum>0 ? "$" + String(Math.round(priceNum)) : "";
-
-        const tdCart = document.createElement("td");
-        tdCart.className = "nowrap";
-        const wrap = document.createElement("div");
-        wrap.className = "iconstack";
-
-        const bPlus = document.createElement("button");
-        bPlus.className = "iconbtn";
-        bPlus.type = "button";
-        bPlus.textContent = "+";
-        bPlus.disabled = inCart > 0;
-        bPlus.addEventListener("click", ()=>{
-          if(state.cart[rid]) return;
-          state.cart[rid] = 1;
-          saveCart(); updateCartButton(); render();
-        });
-
-        const bMinus = document.createElement("button");
-        bMinus.className = "iconbtn";
-        bMinus.type = "button";
-        bMinus.textContent = "−";
-        bMinus.disabled = inCart <= 0;
-        bMinus.addEventListener("click", ()=>{
-          if(!state.cart[rid]) return;
-          delete state.cart[rid];
-          saveCart(); updateCartButton(); render();
-        });
+      if(!tableShown){ $("tbl").style.display = "table"; tableShown = true; }
+      renderWindow(true);
+    }
 
-        wrap.appendChild(bPlus);
-        wrap.appendChild(bMinus);
-        tdCart.appendChild(wrap);
-
-        const tdCover = document.createElement("td");
-        const im = document.createElement("img");
-        im.className = "thumb";
-        im.loading = "lazy";
-        im.src = img;
-        im.alt = (it.artist||"") + " — " + (it.title||"");
-        im.setAttribute("data-full", fullImg || img);
-        tdCover.appendChild(im);
-
-        const tdArtist = document.createElement("td");
-        tdArtist.textContent = it.artist || "";
-        tdArtist.setAttribute("data-sort", it.artist || "");
-
-        const tdTitle = document.createElement("td");
-        tdTitle.setAttribute("data-sort", it.title || "");
-        const a = document.createElement("a");
-        a.className = "dlink";
-        a.href = url;
-        a.target = "_blank";
-        a.rel = "noreferrer";
-        a.textContent = it.title || "";
-        tdTitle.appendChild(a);
-
-        const tdYear = document.createElement("td");
-        tdYear.className = "nowrap";
-        const yearNum = Number(year || "");
-        tdYear.setAttribute("data-sort", Number.isFinite(yearNum) ? String(yearNum) : "");
-        tdYear.textContent = year;
-
-        const tdFmt = document.createElement("td");
-        tdFmt.className = "nowrap";
-        tdFmt.textContent = it.format || "";
-
-        tr.appendChild(tdPrice);
-        tr.appendChild(tdCart);
-        tr.appendChild(tdCover);
-        tr.appendChild(tdArtist);
-        tr.appendChild(tdTitle);
-        tr.appendChild(tdYear);
-        tr.appendChild(tdFmt);
-
-        tbody.appendChild(tr);
+    function onRowClick(e){
+      const btn = e.target.closest("button[data-action]");
+      if(!btn || btn.disabled) return;
+      const tr = btn.closest("tr");
+      const rid = tr ? tr.getAttribute("data-rid") : "";
+      if(!rid) return;
+      if(btn.getAttribute("data-action") === "add"){
+        if(state.cart[rid]) return;
+        state.cart[rid] = 1;
+      }else{
+        if(!state.cart[rid]) return;
+        delete state.cart[rid];
       }
-
-      $("tbl").style.display = "table";
-      setFilterOptions();
+      setCartEntry(rid);
+      saveCart(); updateCartButton(); render();
     }
 
     function boot(){
@@ -588,8 +708,14 @@ HTML = """<!doctype html>
 
       loadCart();
       updateCartButton();
+      window.addEventListener("pagehide", flushCart);
+
+      $("tbody").addEventListener("click", onRowClick);
+      $("cartList").addEventListener("click", onCartListClick);
+      window.addEventListener("scroll", onScroll, {passive:true});
+      window.addEventListener("resize", onScroll);
 
-      $("q").addEventListener("input", ()=>applyFilters());
+      $("q").addEventListener("input", debounce(applyFilters, 150));
       $("artist").addEventListener("change", ()=>applyFilters());
       $("genre").addEventListener("change", ()=>applyFilters());
       $("decade").addEventListener("change", ()=>applyFilters());
@@ -623,6 +749,7 @@ HTML = """<!doctype html>
 
       $("clearCartBtn").addEventListener("click", ()=>{
         state.cart = {};
+        rebuildCartEntries();
         saveCart(); updateCartButton(); render();
         openCart();
       });
@@ -643,14 +770,15 @@ HTML = """<!doctype html>
         })
         .then(j=>{
           state.items = (j && j.items) ? j.items : [];
-          // precompute search blobs (avoid recompute on each filter)
-          for(const it of state.items){ it.__blob = searchBlob(it); }
+          indexItems();
+          rebuildCartEntries();
+          updateCartButton();
           state.filtered = state.items.slice();
 
           $("status").textContent = `${state.items.length} total`;
-          render();
-          applyFilters(); // ensures status text uses filtered count + options in sync
-          makeTableSortable($("tbl"));
+          setFilterOptions();
+          applyFilters();
+          installSort();
           installHover();
         })
         .catch(err=>{
@@ -665,6 +793,13 @@ HTML = """<!doctype html>
 </body>
 </html>
 """
+# Split once around the title tag and minify/encode both halves at import;
+# a build only joins the bytes around its title line.
+_HTML_HEAD, _, _HTML_TAIL = HTML.partition("<title>Record Store</title>")
+_HTML_HEAD_BYTES = _minify_html(_HTML_HEAD)
+_HTML_TAIL_BYTES = _minify_html(_HTML_TAIL)
+
+
 def main() -> int:
     # Allow running store_webpage.py directly without .bat
     load_env_file(Path(r"D:\records\.env"))
@@ -688,7 +823,6 @@ def main() -> int:
     # - If site/images/ contains full-size images (named by md5_16(url)+ext), attach img_full_local
     #   and prefer local images for thumbnails + hover previews.
     try:
-        import json as _json
         import hashlib as _hashlib
         import csv as _csv
         from urllib.parse import urlparse as _urlparse
@@ -716,23 +850,49 @@ def main() -> int:
             og_csv = records_out / "offline_gallery" / "records.csv"
             if og_csv.exists():
                 with og_csv.open("r", encoding="utf-8", errors="replace", newline="") as f:
-                    r = _csv.DictReader(f)
+                    # Plain rows + column indices resolved once from the header (no dict per row)
+                    r = _csv.reader(f)
+                    idx = {h: i for i, h in enumerate(next(r, []))}
+                    rid_cols = [idx[h] for h in ("release_id", "rid", "id") if h in idx]
+                    year_cols = [idx[h] for h in ("year", "released") if h in idx]
+
+                    def _first(row: list[str], cols: list[int]) -> str:
+                        for i in cols:
+                            if i < len(row):
+                                v = row[i].strip()
+                                if v:
+                                    return v
+                        return ""
+
                     for row in r:
-                        rid_s = (row.get("release_id") or row.get("rid") or row.get("id") or "").strip()
+                        rid_s = _first(row, rid_cols)
                         if not rid_s:
                             continue
                         try:
                             rid_i = int(rid_s)
                         except Exception:
                             continue
-                        y = (row.get("year") or row.get("released") or "").strip()
+                        y = _first(row, year_cols)
                         if y:
                             year_map[rid_i] = y
         except Exception:
             year_map = {}
 
         images_dir = SITE_DIR / "images"
-        inv = _json.loads(inv_path.read_text(encoding="utf-8", errors="replace"))
+        # One directory scan up front instead of exists()+stat() per item
+        local_images: set[str] = set()
+        try:
+            with os.scandir(images_dir) as entries:
+                for de in entries:
+                    try:
+                        if de.is_file() and de.stat().st_size > 0:
+                            local_images.add(de.name)
+                    except OSError:
+                        continue
+        except OSError:
+            local_images = set()
+
+        inv = _json_loads(inv_path.read_bytes())
         items = inv.get("items") if isinstance(inv, dict) else None
 
         if isinstance(items, list):
@@ -753,7 +913,7 @@ def main() -> int:
                         changed = True
 
                 # Prefer full-size local images if present
-                if images_dir.exists():
+                if local_images:
                     base_url = (it.get("img_full_url") or it.get("img") or "").strip()
                     if base_url:
                         full_url = _guess_full_discogs_url(base_url)
@@ -766,8 +926,7 @@ def main() -> int:
                         if ext not in [".jpg", ".jpeg", ".png", ".webp"]:
                             ext = ".jpeg"
                         name = _md5_16(full_url) + ext
-                        local_path = images_dir / name
-                        if local_path.exists() and local_path.stat().st_size > 0:
+                        if name in local_images:
                             rel = f"images/{name}"
                             if it.get("img_full_local") != rel:
                                 it["img_full_local"] = rel
@@ -781,14 +940,16 @@ def main() -> int:
                                 changed = True
 
             if changed:
-                inv_path.write_text(_json.dumps(inv, ensure_ascii=False, indent=2), encoding="utf-8")
+                # compact unless STORE_PRETTY=1 (the page's fetch() doesn't need indentation)
+                _write_inventory(inv_path, inv, pretty=(env("STORE_PRETTY", "0") or "0") == "1")
     except Exception:
         pass
 
 
     html_path = SITE_DIR / "index.html"
-    html_out = HTML.replace("<title>Record Store</title>", f"<title>{title}</title>")
-    html_path.write_text(html_out, encoding="utf-8")
+    html_out = _HTML_HEAD_BYTES + _minify_html(f"<title>{title}</title>") + _HTML_TAIL_BYTES
+    # index.html.gz only for servers that serve precompressed files (GitHub Pages doesn't)
+    _emit_html(html_path, html_out, gz=(env("STORE_GZIP", "0") or "0") == "1")
     print(f"Site: {html_path}", flush=True)
     print("Done.", flush=True)
     return 0